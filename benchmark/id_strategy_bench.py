@@ -0,0 +1,107 @@
+"""
+主键生成策略对比: 写入吞吐与表 / 索引体积
+
+uuid1 + string:    旧实现, uuid1().hex 存为 VARCHAR(32), 首段是时间戳低位, 插入位置随机
+uuid7 + string:    按时间递增的 UUIDv7, 仍存为 VARCHAR(32)
+uuid7 + binary:    UUIDv7 存为 BINARY(16)
+snowflake + bigint: 64 位雪花 id 存为 BIGINT
+
+每种策略使用独立的临时 SQLite 文件, 建与 DbBaseModel 相同的默认索引 (is_deleted, created_time, id) 和一个二级索引,
+按批写入后用 dbstat 统计各表 / 索引占用的字节数(SQLite 需要编译 dbstat, 不支持时只输出吞吐)
+并用 BaseService.update_many_by_id 的 CASE 语句更新一批数据, 校验各存储类型下的值确实被修改
+
+运行: python benchmark/id_strategy_bench.py [行数]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ["LOAD_YAML"] = "false"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'unused.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import BigInteger, Column, Index, Integer, MetaData, String, Table, insert, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from entity.id_types import DecimalBigInt, HexBinary  # noqa: E402
+from service.base_service import case_update_stmt  # noqa: E402
+from utils import current_timestamp  # noqa: E402
+from utils.id_utils import SnowflakeGenerator, uuid1_hex, uuid7_hex  # noqa: E402
+
+_snowflake = SnowflakeGenerator(1)
+
+STRATEGIES = {
+    "uuid1 + string": (uuid1_hex, String(32)),
+    "uuid7 + string": (uuid7_hex, String(32)),
+    "uuid7 + binary": (uuid7_hex, HexBinary()),
+    "snowflake + bigint": (lambda: str(_snowflake()), DecimalBigInt()),
+}
+
+
+def build_table(id_type) -> Table:
+    table = Table("bench", MetaData(),
+                  Column("id", id_type, primary_key=True),
+                  Column("created_time", BigInteger, nullable=False),
+                  Column("is_deleted", Integer, nullable=False),
+                  Column("username", String(32), nullable=False))
+    Index("ix_bench_is_deleted_created_time_id", table.c.is_deleted, table.c.created_time, table.c.id)
+    Index("ix_bench_username", table.c.username)
+    return table
+
+
+async def run(name: str, id_factory, id_type, rows: int, batch_size: int = 1000) -> dict:
+    db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_file}")
+    table = build_table(id_type)
+    async with engine.begin() as conn:
+        await conn.run_sync(table.metadata.create_all)
+
+    elapsed = 0.0
+    for offset in range(0, rows, batch_size):
+        batch = [{"id": id_factory(), "created_time": current_timestamp(), "is_deleted": 0,
+                  "username": f"user-{(offset + i) % 1000}"} for i in range(min(batch_size, rows - offset))]
+        start = time.perf_counter()
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), batch)
+        elapsed += time.perf_counter() - start
+
+    async with engine.begin() as conn:
+        ids = (await conn.scalars(select(table.c.id).limit(100))).all()
+        updated = (await conn.execute(case_update_stmt(table, [{"id": pid, "username": f"new-{pid}"} for pid in ids],
+                                                       ("username",)))).rowcount
+        changed = await conn.scalar(select(text("count(*)")).select_from(table).where(
+            table.c.id.in_(ids), table.c.username.like("new-%")))
+    if changed != len(ids) or updated != len(ids):
+        raise AssertionError(f"{name}: CASE 批量更新 {len(ids)} 行, rowcount {updated}, 实际修改 {changed} 行")
+
+    sizes = {}
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+            sizes = {row[0]: row[1] for row in result}
+        except Exception:
+            pass
+    await engine.dispose()
+    return {"name": name, "rows_per_sec": rows / elapsed, "sizes": sizes}
+
+
+async def main(rows: int):
+    print(f"{rows} rows per strategy")
+    for name, (id_factory, id_type) in STRATEGIES.items():
+        result = await run(name, id_factory, id_type, rows)
+        sizes = result["sizes"]
+        pk_size = sum(size for index, size in sizes.items() if index.startswith("sqlite_autoindex_bench"))
+        print(f"{name:>20}: {result['rows_per_sec']:9.0f} rows/s", end="")
+        if sizes:
+            print(f"  table {sizes.get('bench', 0) / 1024:8.0f} KB"
+                  f"  pk index {pk_size / 1024:8.0f} KB"
+                  f"  (is_deleted, created_time, id) {sizes.get('ix_bench_is_deleted_created_time_id', 0) / 1024:8.0f} KB"
+                  f"  username {sizes.get('ix_bench_username', 0) / 1024:8.0f} KB")
+        else:
+            print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000))
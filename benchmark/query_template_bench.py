@@ -0,0 +1,100 @@
+"""
+列表 / 分页查询构造语句的开销对比
+
+before: 旧实现, 每次请求重新拼 Select(hasattr 判断字段、遍历 DTO 字段), 执行时重新计算缓存键
+after:  当前实现, 按查询形状缓存参数化的语句模板, 每次请求只绑定参数值
+
+运行: python benchmark/query_template_bench.py [调用次数]
+使用临时 SQLite 文件, 不依赖 .env 中的数据库配置
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["LOAD_YAML"] = "false"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_file}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import SQLModel  # noqa: E402
+
+from entity import AsyncSessionLocal, engine  # noqa: E402
+from entity.db_models import User  # noqa: E402
+from entity.dto.user_dto import UserQueryReq  # noqa: E402
+from service.user_service import UserService  # noqa: E402
+
+
+class UserDto(UserQueryReq):
+    """带计算字段的投影 DTO"""
+    display_name: str = ""
+
+
+def legacy_build_query(query_params: dict, dto_model_class=None):
+    """旧版 BaseService.build_query"""
+    query_params = {k: v for k, v in query_params.items() if v not in [None, ""]}
+    sort = query_params.get("sort", "desc").lower()
+    orderby = query_params.get("orderby", "created_time").lower()
+    fields = None
+    if dto_model_class is not None:
+        fields = [getattr(User, key) for key in dto_model_class.model_fields.keys() if hasattr(User, key)]
+    stmt = User.select(fields)
+    for key, value in query_params.items():
+        if isinstance(key, str) and hasattr(User, key):
+            stmt = stmt.where(getattr(User, key) == value)
+    order_field = getattr(User, orderby) if hasattr(User, orderby) else User.created_time
+    stmt = stmt.order_by(order_field.desc() if sort == "desc" else order_field.asc())
+    if query_params.get("limit") is not None:
+        stmt = stmt.limit(query_params["limit"])
+    return stmt, None
+
+
+def template_build_query(query_params: dict, dto_model_class=None):
+    return UserService.list_stmt(query_params, dto_model_class=dto_model_class)
+
+
+def requests(i: int):
+    """几种常见的列表查询: 单条件、多条件 + 投影、带 limit"""
+    return [
+        ({"username": f"user-{i % 10}", "sort": "desc", "orderby": "created_time"}, None),
+        ({"username": f"user-{i % 10}", "is_deleted": 0, "sort": "asc", "orderby": "updated_time"}, UserDto),
+        ({"user_role": "user", "limit": 5}, None),
+    ]
+
+
+async def run(build, iterations: int) -> tuple[float, float]:
+    async with AsyncSessionLocal() as session:
+        for query_params, dto in requests(0):  # 预热, 填充编译缓存
+            stmt, params = build(query_params, dto)
+            await session.execute(stmt, params)
+        build_time = 0.0
+        start = time.perf_counter()
+        for i in range(iterations):
+            for query_params, dto in requests(i):
+                build_start = time.perf_counter()
+                stmt, params = build(query_params, dto)
+                build_time += time.perf_counter() - build_start
+                await session.execute(stmt, params)
+        elapsed = time.perf_counter() - start
+    calls = iterations * len(requests(0))
+    return build_time / calls * 1e6, elapsed / calls * 1e6
+
+
+async def main(iterations: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        session.add_all(User(id=f"bench-{i}", username=f"user-{i % 10}", password="x", user_role="user")
+                        for i in range(1000))
+        await session.commit()
+
+    print(f"{iterations * len(requests(0))} calls per variant")
+    for name, build in (("before", legacy_build_query), ("after", template_build_query)):
+        build_us, total_us = await run(build, iterations)
+        print(f"{name:>8}: build {build_us:7.1f} us/call, build + execute {total_us:8.1f} us/call")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,118 @@
+"""
+逻辑删除过滤的单条查询开销对比
+
+before: 旧实现, 每次 execute 都 inspect.signature 并遍历语句的 froms 重建 Select
+after:  当前实现, do_orm_execute 事件附加 with_loader_criteria, 随编译缓存复用
+baseline: 不做任何过滤
+
+运行: python benchmark/soft_delete_bench.py [查询次数]
+使用临时 SQLite 文件, 不依赖 .env 中的数据库配置
+"""
+import asyncio
+import inspect
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["LOAD_YAML"] = "false"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_file}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Select, and_, func  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # noqa: E402
+from sqlalchemy.sql.selectable import Subquery  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from common.constant import Constant  # noqa: E402
+from common.global_enums import IsDelete  # noqa: E402
+from entity import AsyncSessionLocal, engine  # noqa: E402
+from entity.db_models import User  # noqa: E402
+
+# 旧实现使用了已弃用的 Select.froms, 每次调用都会触发告警, 这部分开销计入 before, 但不输出
+warnings.filterwarnings("ignore", message=".*Select.froms.*")
+
+
+class LegacyAsyncSession(AsyncSession):
+    """旧版 EnhanceAsyncSession 的查询路径(仅保留 Select 相关逻辑)"""
+
+    def _add_logical_delete_condition(self, statement: Select) -> Select:
+        if len(statement.froms) == 1 and isinstance(statement.froms[0], Subquery):
+            subquery = statement.froms[0]
+            processed_inner = self._add_logical_delete_condition(subquery.element)
+            if processed_inner is not subquery.element:
+                subquery.element = processed_inner
+            return statement
+        delete_condition = None
+        for from_obj in statement.froms:
+            if isinstance(from_obj, Subquery):
+                continue
+            if hasattr(from_obj, 'columns') and Constant.LOGICAL_DELETE_FIELD in from_obj.columns:
+                condition = from_obj.columns[Constant.LOGICAL_DELETE_FIELD] == IsDelete.NO_DELETE
+                delete_condition = condition if delete_condition is None else and_(delete_condition, condition)
+        if delete_condition is not None:
+            existing_condition = statement.whereclause
+            if existing_condition is not None:
+                statement = statement.where(and_(existing_condition, delete_condition))
+            else:
+                statement = statement.where(delete_condition)
+        return statement
+
+    async def execute(self, statement, params=None, *, execution_options=None, bind_arguments=None, **kw):
+        sig = inspect.signature(super().execute)
+        if execution_options is None:
+            execution_options = sig.parameters['execution_options'].default
+        if isinstance(statement, Select):
+            statement = self._add_logical_delete_condition(statement)
+        return await super().execute(statement, params=params, execution_options=execution_options,
+                                     bind_arguments=bind_arguments, **kw)
+
+
+LegacySessionLocal = async_sessionmaker(bind=engine, class_=LegacyAsyncSession, expire_on_commit=False,
+                                        autoflush=False)
+PlainSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+
+def statements():
+    """几种常见的语句结构: 按 id 查询、条件分页、count"""
+    return [
+        User.select().where(User.id == "bench-1"),
+        User.select().where(User.username == "user-1").order_by(User.created_time.desc()).limit(12).offset(24),
+        Select(func.count(User.id)).where(User.username == "user-1"),
+    ]
+
+
+async def run(session_factory, iterations: int) -> float:
+    async with session_factory() as session:
+        for stmt in statements():  # 预热, 填充编译缓存
+            await session.execute(stmt)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for stmt in statements():
+                await session.execute(stmt)
+        elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(statements())) * 1e6
+
+
+async def main(iterations: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        session.add_all(User(id=f"bench-{i}", username=f"user-{i % 10}", password="x", user_role="user")
+                        for i in range(1000))
+        await session.commit()
+
+    results = {}
+    for name, factory in (("baseline", PlainSessionLocal), ("before", LegacySessionLocal), ("after", AsyncSessionLocal)):
+        results[name] = await run(factory, iterations)
+    print(f"{iterations * len(statements())} queries per variant")
+    for name, us in results.items():
+        overhead = us - results["baseline"]
+        print(f"{name:>8}: {us:8.1f} us/query  (overhead vs baseline {overhead:+7.1f} us)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -6,4 +6,6 @@ class MetaConst(type):
 
 
 class Constant(metaclass=MetaConst):
-    LOGICAL_DELETE_FIELD = "is_deleted"
\ No newline at end of file
+    LOGICAL_DELETE_FIELD = "is_deleted"
+    DEFAULT_PAGE_SIZE = 12
+    MAX_PAGE_SIZE = 100  # 单页最大条数
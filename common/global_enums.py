@@ -16,3 +16,22 @@ class LLMType(StrEnum):
     IMAGE2TEXT = 'image2text'
     RERANK = 'rerank'
     TTS    = 'tts'
+
+
+class CountMode(StrEnum):
+    """分页总数统计方式"""
+    EXACT = "exact"  # 每次执行 COUNT
+    CACHED = "cached"  # 相同过滤条件复用缓存的 COUNT 结果, 写操作后失效
+    ESTIMATE = "estimate"  # 读取表统计信息估算(仅无过滤条件时), 否则退回 cached
+    NONE = "none"  # 不统计总数, 多取一条判断是否有下一页
+
+
+class BulkUpdateStrategy(StrEnum):
+    """批量更新方式"""
+    CASE = "case"  # 每批一条 UPDATE ... SET col = CASE id WHEN ... THEN ... END WHERE id IN (...)
+    EXECUTEMANY = "executemany"  # 每组一条参数化 UPDATE, 交给驱动 executemany
+
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
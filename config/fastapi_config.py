@@ -12,6 +12,9 @@ from config import settings
 
 __all__ = ["app"]
 
+from core.existence import start_bloom_refresh, stop_bloom_refresh, warm_bloom_filters
+from core.purge import start_purge_job, stop_purge_job
+from core.write_behind import drain_write_behind
 from entity import close_engine
 from entity.db_models import init_db
 
@@ -32,7 +35,14 @@ async def lifespan(app: FastAPI):
     # 2. 把40个线程改成80
     limiter.total_tokens = 80
     await init_db()
+    await warm_bloom_filters()
+    start_bloom_refresh()
+    start_purge_job()
     yield  # 上面是启动时做的操作，下面是关闭时做的操作
+    await stop_purge_job()
+    await stop_bloom_refresh()
+    # 先写完写缓冲队列中的数据, 再关闭连接池
+    await drain_write_behind()
     await close_engine()
 
 
@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Optional
 
 from dotenv import load_dotenv
 from pydantic.v1 import BaseSettings as Base
@@ -41,6 +42,48 @@ class Settings(BaseSettings):
     host_port: int = 8080
     # sql驱动连接
     database_url: str = ''
+    # 只读副本连接, 普通查询按策略分发到副本: round_robin 轮询 / least_connections 最少连接
+    database_replica_urls: list = []
+    database_replica_strategy: str = 'round_robin'
+    # 连接池预设(见 core.db_metrics.POOL_PROFILES): default / high_concurrency / low_resource
+    db_pool_profile: str = 'default'
+    # 覆盖预设中的单项, eg. {"pool_size": 20, "pool_pre_ping": true}
+    db_pool: dict = {}
+    # 慢查询记录: 超过阈值的语句进入环形缓冲, 总耗时靠前的 SELECT 自动执行一次 EXPLAIN
+    slow_query_threshold_ms: int = 200
+    slow_query_log_size: int = 500
+    slow_query_explain: bool = True
+    slow_query_explain_top: int = 10
+    # 请求级语句统计: 超过任一阈值时记录告警日志, debug 模式下另外输出 Server-Timing 响应头
+    request_query_warn_count: int = 30  # 单个请求的语句数
+    request_query_warn_ms: int = 500  # 单个请求的数据库总耗时
+    request_query_warn_duplicates: int = 5  # 同一语句在单个请求内的重复次数(N+1)
+    # 分页总数缓存
+    count_cache_ttl: int = 30  # 秒
+    count_cache_maxsize: int = 1024
+    # 存在性判断(is_exist)的否定结果缓存, 其他进程的写入最多延迟 ttl 秒可见, 0 表示关闭
+    exist_negative_cache_ttl: float = 5  # 秒
+    exist_negative_cache_maxsize: int = 10000
+    # 批量写入时单条语句的最大估算字节数, 需小于数据库的包大小限制(MySQL max_allowed_packet)
+    db_max_packet_bytes: int = 4 * 1024 * 1024
+    # 批量接口(BaseController.base_batch)单次请求的最大条数, 新增、更新、删除合计
+    batch_max_items: int = 1000
+    # 增量同步(get_changes, 始终读主库)只返回 updated_time 早于当前时间该毫秒数的数据, 需大于最长写事务耗时与各实例间的时钟偏差
+    change_feed_settle_ms: int = 2000
+    # 已逻辑删除数据的归档 / 清理任务(保留策略见各 service 的 retention), 每隔 purge_interval_seconds 秒执行一轮
+    purge_enabled: bool = True
+    purge_interval_seconds: int = 3600
+    # 启动建表时加文件锁, 同一台机器上的多个 worker 只有一个执行 DDL
+    db_init_lock: bool = False
+    db_init_lock_timeout: int = 60  # 秒
+    # 主键 id 生成策略: uuid1(默认, 兼容已有数据) / uuid7(按时间递增) / snowflake(64 位雪花算法)
+    id_strategy: str = 'uuid1'
+    # 主键存储类型: string(VARCHAR(32)) / binary(BINARY(16), 仅 uuid) / bigint(BIGINT, 仅 snowflake)
+    id_storage: str = 'string'
+    # 雪花算法机器号(0-1023), 不配置时取进程号的低 10 位, 多台机器部署时需为每个进程分配不同的值
+    id_worker_id: Optional[int] = None
+    # 每个 service 缓存的查询语句模板数量上限
+    query_template_cache_size: int = 256
 
     # yaml配置
     yaml_config: dict = {}
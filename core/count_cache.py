@@ -0,0 +1,53 @@
+import json
+import threading
+from typing import Optional
+
+from cachetools import TTLCache
+
+from config import settings
+
+
+class CountCache:
+    """
+    分页总数缓存
+    按模型分区, 缓存键为总数查询的形状与绑定参数(即规范化后的过滤条件)
+    语句模板通过执行选项 count_cache_key 给出形状(如过滤字段), 其余语句以编译后的 SQL 作为形状
+    通过 BaseService 的写操作使对应模型的分区整体失效, 其他进程的写入只能依赖 ttl 过期
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._partitions: dict[str, TTLCache] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(count_stmt, params: Optional[dict] = None) -> str:
+        shape = count_stmt.get_execution_options().get("count_cache_key")
+        if shape is not None:
+            # 语句模板的值全部来自 params, 无需编译
+            return repr(shape) + "|" + json.dumps(params or {}, sort_keys=True, default=str)
+        compiled = count_stmt.compile()
+        bind_params = {**compiled.params, **(params or {})}
+        return compiled.string + "|" + json.dumps(bind_params, sort_keys=True, default=str)
+
+    def get(self, model_name: str, key: str) -> Optional[int]:
+        partition = self._partitions.get(model_name)
+        if partition is None:
+            return None
+        with self._lock:
+            return partition.get(key)
+
+    def set(self, model_name: str, key: str, count: int):
+        with self._lock:
+            partition = self._partitions.get(model_name)
+            if partition is None:
+                partition = self._partitions[model_name] = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+            partition[key] = count
+
+    def invalidate(self, model_name: str):
+        with self._lock:
+            self._partitions.pop(model_name, None)
+
+
+count_cache = CountCache(maxsize=settings.count_cache_maxsize, ttl=settings.count_cache_ttl)
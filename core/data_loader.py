@@ -0,0 +1,92 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from core.global_context import current_loaders
+
+BatchLoadFn = Callable[[list], Awaitable[dict]]
+
+
+class DataLoader:
+    """
+    请求级批量加载器
+    同一轮事件循环内发起的 load 调用会被合并, 由 batch_load_fn 一次性加载, 再把结果分发给各个调用方
+    已加载过的 key 直接复用结果(请求级 identity map), 同一个 id 在一个请求内不会重复查库
+    batch_load_fn: 接收 key 列表, 返回 {key: value}, 缺失的 key 视为 None
+    """
+
+    def __init__(self, batch_load_fn: BatchLoadFn):
+        self.batch_load_fn = batch_load_fn
+        self._futures: dict[Hashable, asyncio.Future] = {}
+        self._queue: list[Hashable] = []
+
+    def load(self, key: Hashable) -> Awaitable[Any]:
+        """
+        返回的是共享 Future 的 shield: 某个调用方被取消(如 wait_for 超时)时只取消它自己的等待,
+        不影响同一个 key 的其他调用方
+        """
+        future = self._futures.get(key)
+        if future is not None and (future.cancelled() or future.done() and future.exception() is not None):
+            # 已取消或加载失败的结果不复用, 重新加载
+            del self._futures[key]
+            future = None
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                # 等当前这一轮已就绪的协程都提交完 key 后再统一加载
+                loop.call_soon(self._dispatch)
+        return asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self, keys: Optional[Iterable[Hashable]] = None):
+        """写操作后清除已加载的结果, keys 为 None 时全部清除"""
+        if keys is None:
+            self._futures = {k: f for k, f in self._futures.items() if not f.done()}
+            return
+        for key in keys:
+            future = self._futures.get(key)
+            if future is not None and future.done():
+                del self._futures[key]
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, []
+        asyncio.ensure_future(self._load_batch(keys))
+
+    async def _load_batch(self, keys: list):
+        try:
+            results = await self.batch_load_fn(keys)
+        except BaseException as e:
+            # 包括加载任务被取消: 未完成的 Future 全部结束并移除, 避免调用方永远等待, 之后的 load 重新加载
+            for key in keys:
+                future = self._futures.pop(key, None)
+                if future is None or future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key in keys:
+            future = self._futures.get(key)
+            if future is None:
+                continue
+            if future.cancelled():
+                del self._futures[key]
+            elif not future.done():
+                future.set_result(results.get(key))
+
+
+def get_request_loader(name: Hashable, batch_load_fn: BatchLoadFn) -> Optional[DataLoader]:
+    """获取当前请求内名为 name 的加载器, 不在请求上下文中时返回 None"""
+    loaders = current_loaders.get()
+    if loaders is None:
+        return None
+    loader = loaders.get(name)
+    if loader is None:
+        loader = loaders[name] = DataLoader(batch_load_fn)
+    return loader
@@ -0,0 +1,188 @@
+import bisect
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.global_context import current_query_stats
+from core.slow_query import slow_query_log
+
+# 连接池预设, 键为 create_async_engine 的参数名
+POOL_PROFILES = {
+    "default": {
+        "pool_size": 10,  # 连接池大小
+        "max_overflow": 20,  # 最大溢出连接数
+        "pool_timeout": 30,  # 获取连接的最长等待时间（秒）
+        "pool_recycle": 3600,  # 连接回收时间（秒），解决MySQL超时断开问题
+        "pool_pre_ping": False,  # 取出连接前先 ping 一次
+        "pool_use_lifo": False,  # 后进先出, 空闲连接更容易被回收
+    },
+    # 高并发: 连接数与线程池令牌数(limiter.total_tokens)同一量级, 等不到连接时尽快失败
+    "high_concurrency": {
+        "pool_size": 40,
+        "max_overflow": 40,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": False,
+        "pool_use_lifo": True,
+    },
+    # 低资源: 少量长连接, 连接可能被数据库或网络设备断开, 取出前先 ping
+    "low_resource": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+        "pool_recycle": 3600,
+        "pool_pre_ping": True,
+        "pool_use_lifo": True,
+    },
+}
+
+# 语句耗时直方图的桶上界(毫秒), 最后一个桶为 +inf
+STATEMENT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def pool_options(profile: str, overrides: dict = None) -> dict:
+    """
+    连接池参数: 以 profile 对应的预设为基础, overrides 中的同名项覆盖预设
+    """
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"未知的连接池配置: {profile}, 可选: {', '.join(POOL_PROFILES)}")
+    options = dict(POOL_PROFILES[profile])
+    for key, value in (overrides or {}).items():
+        if key not in options:
+            raise ValueError(f"不支持的连接池参数: {key}")
+        options[key] = value
+    return options
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    记录获取连接等待情况的连接池: 正在等待的协程数、最近的等待耗时(用于 p50 / p99)
+    等待耗时包含新建连接和 pre_ping 的耗时
+    """
+
+    def __init__(self, *args, wait_samples: int = 2048, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self._wait_times = deque(maxlen=wait_samples)
+        self._stats_lock = threading.Lock()
+
+    def connect(self):
+        with self._stats_lock:
+            self.waiting += 1
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self.waiting -= 1
+                self.checkouts += 1
+                self._wait_times.append(elapsed)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            wait_times = sorted(self._wait_times)
+            waiting, checkouts, timeouts = self.waiting, self.checkouts, self.timeouts
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self._timeout,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "waiting": waiting,
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "wait_p50_ms": _percentile(wait_times, 0.5) * 1000,
+            "wait_p99_ms": _percentile(wait_times, 0.99) * 1000,
+            "wait_max_ms": (wait_times[-1] if wait_times else 0.0) * 1000,
+        }
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+class StatementHistogram:
+    """语句执行耗时直方图(从游标执行前到执行后, 不含取结果)"""
+
+    def __init__(self, buckets_ms: tuple = STATEMENT_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms: float):
+        index = bisect.bisect_left(self.buckets_ms, elapsed_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = list(self.counts)
+            total_ms, max_ms = self.total_ms, self.max_ms
+        labels = [f"<={bound}ms" for bound in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        count = sum(counts)
+        return {
+            "count": count,
+            "avg_ms": total_ms / count if count else 0.0,
+            "max_ms": max_ms,
+            "buckets": dict(zip(labels, counts)),
+        }
+
+
+# 已注册的引擎: 名称 -> (连接池配置名, AsyncEngine)
+_engines: dict = {}
+statement_histogram = StatementHistogram()
+
+
+def instrument_engine(name: str, profile: str, async_engine):
+    """
+    注册引擎的监控: 连接池统计由 InstrumentedPool 记录, 语句耗时、慢查询与请求级统计通过游标执行事件记录
+    """
+    _engines[name] = (profile, async_engine)
+    sync_engine = async_engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+        statement_histogram.observe(elapsed_ms)
+        slow_query_log.observe(conn, statement, parameters, executemany, elapsed_ms,
+                               stream_results=bool(context.execution_options.get("stream_results")))
+        query_stats = current_query_stats.get()
+        if query_stats is not None:
+            query_stats.observe(statement, elapsed_ms)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # 执行失败时不会触发 after_cursor_execute, 丢弃开始时间
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+
+
+def db_pool_stats() -> list[dict]:
+    result = []
+    for name, (profile, async_engine) in _engines.items():
+        pool = async_engine.sync_engine.pool
+        stats = pool.stats() if isinstance(pool, InstrumentedPool) else {}
+        result.append({"name": name, "profile": profile, **stats})
+    return result
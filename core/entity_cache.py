@@ -0,0 +1,97 @@
+import sys
+import threading
+from typing import Any, Hashable, Iterable, Optional
+
+from cachetools import TTLCache
+
+from core.service_extension import ServiceExtension
+
+
+class _SizedTTLCache(TTLCache):
+    """记录容量淘汰次数的 TTLCache(过期清理不计入淘汰)"""
+
+    def __init__(self, maxsize, ttl, getsizeof=None):
+        super().__init__(maxsize, ttl, getsizeof=getsizeof)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+def _sizeof(data: dict) -> int:
+    return sys.getsizeof(data) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in data.items())
+
+
+class EntityCache(ServiceExtension):
+    """
+    进程内实体缓存(LRU + TTL), 容量按字节估算
+    缓存的是实体字段字典而不是模型对象, 避免不同请求共享同一个可变对象
+    """
+
+    def __init__(self, ttl: int = 60, max_bytes: int = 16 * 1024 * 1024, name: str = None):
+        super().__init__(name)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._cache = _SizedTTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=_sizeof)
+        self._lock = threading.Lock()
+        # 每次失效递增, 用于丢弃失效之前发起的查询结果, 避免回填旧数据
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        with self._lock:
+            data = self._cache.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return data
+
+    def get_many(self, keys: Iterable[Hashable]) -> tuple[dict, list]:
+        """返回 (命中的 {key: data}, 未命中的 key 列表)"""
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                data = self._cache.get(key)
+                if data is None:
+                    missing.append(key)
+                else:
+                    found[key] = data
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put(self, key: Hashable, data: dict, epoch: int = None):
+        """epoch: 发起查询时的 epoch, 期间发生过失效则放弃回填"""
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            try:
+                self._cache[key] = data
+            except ValueError:
+                # 单条数据超过缓存总容量
+                pass
+
+    def invalidate(self, keys: Iterable[Hashable]):
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"name": self.name, "size": len(self._cache), "bytes": self._cache.currsize,
+                    "max_bytes": self.max_bytes, "ttl": self.ttl, "hits": self.hits, "misses": self.misses,
+                    "evictions": self._cache.evictions}
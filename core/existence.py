@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+import unicodedata
+from enum import Enum
+from typing import Iterable, Optional
+
+from cachetools import TTLCache
+
+from config import settings
+from core.service_extension import ServiceExtension
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    布隆过滤器: 判断不存在时一定不存在, 判断存在时有 error_rate 的概率误判
+    位数组与哈希次数按预期容量和误判率计算, 写入量超过容量后误判率上升(不会漏判)
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value) -> Iterable[int]:
+        # 双重哈希: 由一次 128 位摘要的高低两半派生 k 个位置
+        if isinstance(value, Enum):
+            value = value.value
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class ColumnBloomFilter(ServiceExtension):
+    """
+    按字段的布隆过滤器, 用于唯一性校验(如用户名是否已被占用)等存在性判断
+    启动时由 lifespan 加载字段的全部取值(含已逻辑删除的数据), 之后随 save / insert_many / 更新追加
+    删除数据不会从过滤器移除, 只会增加误判, 不影响正确性
+    其他进程的写入不会进入本进程的过滤器, 因此每隔 refresh_seconds / 2 秒由后台任务重建一次,
+    超过 refresh_seconds 未重建的过滤器不再参与判断; 多 worker 或多实例部署时, 判断"不存在"最多滞后 refresh_seconds,
+    只适合作为快速预检, 不能代替数据库唯一约束
+    字符串取值默认按数据库不区分大小写的排序规则(MySQL 默认的 *_ci)归一化后再判断: 去掉末尾空格、去掉重音、casefold,
+    否则库中有 "Alice" 时 "alice" 会被判为一定不存在; 区分大小写的列可设置 case_sensitive=True 以减少误判
+    归一化只覆盖大小写、重音和末尾空格, 排序规则中还有其他等价关系(如 utf8mb4_general_ci 中 ß = s)的列不要启用
+    """
+
+    def __init__(self, *columns: str, capacity: int = 1_000_000, error_rate: float = 0.01,
+                 refresh_seconds: int = 60, case_sensitive: bool = False):
+        super().__init__()
+        self.columns = columns
+        self.case_sensitive = case_sensitive
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self._filters: dict[str, BloomFilter] = {}
+        self._building: Optional[dict[str, BloomFilter]] = None  # 重建中的过滤器
+        self._lock = threading.Lock()
+        self.warmed_at: Optional[float] = None
+        self.refreshes = 0
+        self.negatives = 0  # 由过滤器直接判断为不存在的次数
+
+    @property
+    def age(self) -> Optional[float]:
+        return None if self.warmed_at is None else time.monotonic() - self.warmed_at
+
+    @property
+    def ready(self) -> bool:
+        """已加载完成且未过期"""
+        age = self.age
+        return age is not None and age <= self.refresh_seconds
+
+    def begin_rebuild(self):
+        """开始重建: 旧过滤器在重建期间继续使用, 期间的写入同时追加到新旧两份"""
+        with self._lock:
+            self._building = {column: BloomFilter(self.capacity, self.error_rate) for column in self.columns}
+
+    def add_loaded(self, rows: Iterable):
+        with self._lock:
+            if self._building is not None:
+                self._add(self._building, rows)
+
+    def finish_rebuild(self):
+        with self._lock:
+            if self._building is None:
+                return
+            self._filters, self._building = self._building, None
+            self.warmed_at = time.monotonic()
+            self.refreshes += 1
+
+    def abort_rebuild(self):
+        with self._lock:
+            self._building = None
+
+    def add_rows(self, rows: Iterable):
+        """rows 为字典(或行映射)或模型对象"""
+        rows = list(rows)
+        with self._lock:
+            self._add(self._filters, rows)
+            if self._building is not None:
+                self._add(self._building, rows)
+
+    def _normalize(self, value):
+        """把排序规则下相等的字符串映射为同一个取值"""
+        if self.case_sensitive or not isinstance(value, str):
+            return value
+        value = unicodedata.normalize("NFKD", value.rstrip(" "))
+        return "".join(ch for ch in value if not unicodedata.combining(ch)).casefold()
+
+    def _add(self, filters: dict[str, BloomFilter], rows: Iterable):
+        for row in rows:
+            for column, bloom in filters.items():
+                value = row.get(column) if hasattr(row, "get") else getattr(row, column, None)
+                if value is not None:
+                    bloom.add(self._normalize(value))
+
+    def definitely_absent(self, filters: dict) -> bool:
+        """过滤条件为等值且同时满足, 任一字段的取值一定不存在时整体一定不存在"""
+        if not self.ready:
+            return False
+        with self._lock:
+            for column, value in filters.items():
+                bloom = self._filters.get(column)
+                if bloom is not None and self._normalize(value) not in bloom:
+                    self.negatives += 1
+                    return True
+        return False
+
+    def stats(self) -> dict:
+        age = self.age
+        return {
+            "name": self.name,
+            "ready": self.ready,
+            "age_seconds": None if age is None else round(age, 1),
+            "refreshes": self.refreshes,
+            "negatives": self.negatives,
+            "columns": {column: bloom.count for column, bloom in self._filters.items()},
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+        }
+
+
+class NegativeExistenceCache:
+    """
+    存在性判断的否定结果缓存(短 TTL), 按模型分区
+    通过 BaseService 的写操作使对应模型的分区整体失效; 每次失效递增分区版本,
+    查询开始之后发生过写入的否定结果不再写入缓存, 避免缓存写入前一刻刚插入的数据被判为不存在
+    其他进程的写入只能依赖 ttl 过期
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._partitions: dict[str, TTLCache] = {}
+        self._epochs: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(filters: dict) -> str:
+        return json.dumps(filters, sort_keys=True, default=str)
+
+    def epoch(self, model_name: str) -> int:
+        return self._epochs.get(model_name, 0)
+
+    def contains(self, model_name: str, key: str) -> bool:
+        partition = self._partitions.get(model_name)
+        if partition is None:
+            return False
+        with self._lock:
+            return key in partition
+
+    def add(self, model_name: str, key: str, epoch: int):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if self._epochs.get(model_name, 0) != epoch:
+                return
+            partition = self._partitions.get(model_name)
+            if partition is None:
+                partition = self._partitions[model_name] = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+            partition[key] = True
+
+    def invalidate(self, model_name: str):
+        with self._lock:
+            self._epochs[model_name] = self._epochs.get(model_name, 0) + 1
+            self._partitions.pop(model_name, None)
+
+
+negative_existence_cache = NegativeExistenceCache(maxsize=settings.exist_negative_cache_maxsize,
+                                                  ttl=settings.exist_negative_cache_ttl)
+
+_refresh_task: Optional[asyncio.Task] = None
+
+
+async def warm_bloom_filters(max_age: float = 0):
+    """加载(或重建)已经超过 max_age 秒的过滤器, 单个失败只记录日志, 过期后不再参与判断"""
+    for bloom_filter in ColumnBloomFilter.instances:
+        age = bloom_filter.age
+        if age is not None and age < max_age:
+            continue
+        try:
+            await bloom_filter.service.warm_bloom_filter()
+        except Exception:
+            logger.exception("加载布隆过滤器失败: %s", bloom_filter.name)
+
+
+async def _refresh_loop():
+    interval = max(min(bloom_filter.refresh_seconds for bloom_filter in ColumnBloomFilter.instances) / 2, 1)
+    while True:
+        await asyncio.sleep(interval)
+        await warm_bloom_filters(max_age=interval)
+
+
+def start_bloom_refresh():
+    global _refresh_task
+    if ColumnBloomFilter.instances and _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_loop(), name="bloom-filter-refresh")
+
+
+async def stop_bloom_refresh():
+    global _refresh_task
+    if _refresh_task is None:
+        return
+    _refresh_task.cancel()
+    try:
+        await _refresh_task
+    except asyncio.CancelledError:
+        pass
+    _refresh_task = None
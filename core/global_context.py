@@ -1,6 +1,20 @@
 from contextvars import ContextVar
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+if TYPE_CHECKING:
+    from core.query_stats import RequestQueryStats
+
+# 请求级工作单元的 session, 由 entity.unit_of_work 设置
 current_session: ContextVar[Optional[AsyncSession]] = ContextVar("current_session", default=None)
+# 请求级批量加载器, 由 RequestContextMiddleWare 在每个请求开始时初始化
+current_loaders: ContextVar[Optional[dict]] = ContextVar("current_loaders", default=None)
+# 为 True 时查询不走只读副本, 由 entity.read_from_primary 设置
+force_primary: ContextVar[bool] = ContextVar("force_primary", default=False)
+# 当前请求的路由(METHOD path), 由 RequestContextMiddleWare 设置, 用于慢查询定位来源
+current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+# 当前执行的 BaseService 方法, 由 core.slow_query.track_service_method 设置
+current_service_method: ContextVar[Optional[str]] = ContextVar("current_service_method", default=None)
+# 当前请求的语句统计, 由 RequestContextMiddleWare 设置
+current_query_stats: ContextVar[Optional["RequestQueryStats"]] = ContextVar("current_query_stats", default=None)
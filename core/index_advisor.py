@@ -0,0 +1,79 @@
+import threading
+from typing import Optional
+
+from sqlmodel import SQLModel
+
+from common.constant import Constant
+
+
+class IndexAdvisor:
+    """
+    索引建议: 记录 BaseService 实际执行的查询形状(等值过滤字段 + 排序字段)及次数,
+    与模型声明的索引对比, 找出不能走索引范围扫描的形状并给出建议的组合索引
+    理想索引为: 等值过滤字段(含逻辑删除字段) + 排序字段 + id
+    """
+
+    def __init__(self, max_shapes: int = 1000):
+        self.max_shapes = max_shapes
+        self._shapes: dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, table_name: str, filter_keys: tuple, orderby: Optional[str] = None):
+        key = (table_name, filter_keys, orderby)
+        with self._lock:
+            if key in self._shapes:
+                self._shapes[key] += 1
+            elif len(self._shapes) < self.max_shapes:
+                self._shapes[key] = 1
+
+    def advise(self) -> list[dict]:
+        with self._lock:
+            shapes = sorted(self._shapes.items(), key=lambda item: item[1], reverse=True)
+        advice = []
+        for (table_name, filter_keys, orderby), count in shapes:
+            table = SQLModel.metadata.tables.get(table_name)
+            if table is None or "id" in filter_keys:
+                continue
+            equality = set(filter_keys)
+            if Constant.LOGICAL_DELETE_FIELD in table.c:
+                equality.add(Constant.LOGICAL_DELETE_FIELD)
+            if self._covered(table, equality, orderby):
+                continue
+            # 业务过滤字段在前, 逻辑删除字段取值少, 放在其后
+            columns = sorted(equality - {Constant.LOGICAL_DELETE_FIELD})
+            if Constant.LOGICAL_DELETE_FIELD in equality:
+                columns.append(Constant.LOGICAL_DELETE_FIELD)
+            if orderby is not None and orderby not in columns:
+                columns.append(orderby)
+            if "id" not in columns:
+                columns.append("id")
+            name = f"ix_{table_name}_{'_'.join(columns)}"[:64]
+            advice.append({
+                "table": table_name,
+                "filters": list(filter_keys),
+                "orderby": orderby,
+                "count": count,
+                "columns": columns,
+                "ddl": f"CREATE INDEX {name} ON {table_name} ({', '.join(columns)})",
+            })
+        return advice
+
+    @staticmethod
+    def _covered(table, equality: set, orderby: Optional[str]) -> bool:
+        """存在以等值字段(任意顺序)开头、紧接排序字段的索引"""
+        candidates = [table.primary_key, *table.indexes]
+        for index in candidates:
+            # 部分索引只覆盖满足条件的数据, 不作为通用查询的依据
+            if any(key.endswith("_where") and value is not None for key, value in index.dialect_kwargs.items()):
+                continue
+            columns = [column.name for column in index.columns]
+            if set(columns[:len(equality)]) != equality:
+                continue
+            if orderby is None or orderby in equality:
+                return True
+            if len(columns) > len(equality) and columns[len(equality)] == orderby:
+                return True
+        return False
+
+
+index_advisor = IndexAdvisor()
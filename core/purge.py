@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import BigInteger, Column, MetaData, Table
+
+from config import settings
+from core.service_extension import ServiceExtension
+
+logger = logging.getLogger(__name__)
+
+# 首次清理在启动后延迟执行, 避开启动时的预热与流量高峰
+INITIAL_DELAY_SECONDS = 60
+
+# 归档表不属于 SQLModel.metadata, 不参与建表与表结构指纹, 首次归档时按需创建
+_archive_metadata = MetaData()
+
+
+def archive_table_for(table: Table) -> Table:
+    """
+    归档表 <表名>_archive: 与原表字段相同(不复制索引和约束), 另加归档时间 archived_time
+    主键为 (id, archived_time): 同一 id 可能被清理后再次写入(upsert / 指定 id 写入)并再次删除,
+    每次归档都要保留, 只以 id 为主键时第二次归档会因主键冲突失败, 该表的清理从此卡在同一批数据上
+    """
+    name = f"{table.name}_archive"
+    if name in _archive_metadata.tables:
+        return _archive_metadata.tables[name]
+    columns = [Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns]
+    return Table(name, _archive_metadata, *columns,
+                 Column("archived_time", BigInteger, primary_key=True, autoincrement=False))
+
+
+class RetentionPolicy(ServiceExtension):
+    """
+    已逻辑删除数据的保留策略: is_deleted=1 且 updated_time(即删除时间)早于 days 天前的数据,
+    archive 为 True 时移入归档表后物理删除, 否则直接物理删除
+    每批最多 batch_size 行, 单独一个短事务, 按 (updated_time, id) 顺序推进; 限制每秒处理 rows_per_second 行,
+    批次之间让出连接与锁, 不阻塞线上请求
+    由 lifespan 启动的后台任务定期执行
+    """
+
+    def __init__(self, days: int = 30, archive: bool = True, batch_size: int = 500, rows_per_second: int = 2000):
+        super().__init__()
+        self.days = days
+        self.archive = archive
+        self.batch_size = batch_size
+        self.rows_per_second = rows_per_second
+        self.running = False
+        self.runs = 0
+        self.archived = 0
+        self.deleted = 0
+        self.last_run_rows = 0
+        self.last_started: Optional[int] = None
+        self.last_finished: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.position: Optional[int] = None  # 本轮已处理到的 updated_time
+
+    def cutoff(self, now_ms: int) -> int:
+        return now_ms - self.days * 86400 * 1000
+
+    async def throttle(self, rows: int, elapsed: float):
+        """按 rows_per_second 限速: 本批耗时不足配额时补足等待"""
+        if self.rows_per_second > 0:
+            await asyncio.sleep(max(rows / self.rows_per_second - elapsed, 0))
+        else:
+            await asyncio.sleep(0)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "days": self.days,
+            "archive": self.archive,
+            "running": self.running,
+            "runs": self.runs,
+            "archived": self.archived,
+            "deleted": self.deleted,
+            "last_run_rows": self.last_run_rows,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_error": self.last_error,
+            "position": self.position,
+        }
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def purge_all():
+    """依次清理各模型, 单个模型失败只记录错误, 不影响其他模型"""
+    for policy in RetentionPolicy.instances:
+        try:
+            await policy.service.purge_deleted()
+        except Exception as e:
+            policy.last_error = str(e)
+            logger.exception("清理已删除数据失败: %s", policy.name)
+
+
+async def _purge_loop():
+    await asyncio.sleep(INITIAL_DELAY_SECONDS)
+    while True:
+        start = time.monotonic()
+        await purge_all()
+        await asyncio.sleep(max(settings.purge_interval_seconds - (time.monotonic() - start), 0))
+
+
+def start_purge_job():
+    global _task
+    if settings.purge_enabled and RetentionPolicy.instances and _task is None:
+        _task = asyncio.create_task(_purge_loop(), name="purge-deleted")
+
+
+async def stop_purge_job():
+    """取消后台任务; 正在执行的批次随事务回滚, 下次启动时重新处理"""
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
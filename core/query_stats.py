@@ -0,0 +1,34 @@
+from core.slow_query import normalize_sql
+
+
+class RequestQueryStats:
+    """
+    单个请求内的语句统计: 执行次数、数据库总耗时、重复执行的语句
+    执行时只按原始 SQL 字符串计数(编译缓存命中时是同一个字符串), 规范化推迟到请求结束后且只在需要时进行
+    """
+    __slots__ = ("count", "total_ms", "_statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self._statements: dict[str, int] = {}
+
+    def observe(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self._statements[statement] = self._statements.get(statement, 0) + 1
+
+    def duplicates(self, min_count: int = 2) -> dict[str, int]:
+        """执行了 min_count 次及以上的规范化语句(常见于循环中逐条查询的 N+1 问题), 按次数倒序"""
+        normalized: dict[str, int] = {}
+        for statement, count in self._statements.items():
+            sql = normalize_sql(statement)
+            normalized[sql] = normalized.get(sql, 0) + count
+        repeated = {sql: count for sql, count in normalized.items() if count >= min_count}
+        return dict(sorted(repeated.items(), key=lambda item: item[1], reverse=True))
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头, 浏览器开发者工具的 Timing 面板中可直接查看"""
+        duplicated = sum(count - 1 for count in self.duplicates().values())
+        return (f'db;dur={self.total_ms:.1f};desc="{self.count} queries", '
+                f'db-dup;desc="{duplicated} duplicated"')
@@ -0,0 +1,34 @@
+from typing import Optional
+
+
+class ServiceExtension:
+    """
+    BaseService 的可选扩展(实体缓存、写缓冲队列、布隆过滤器、保留策略)的基类
+    在 BaseService 子类上把扩展实例设置为类属性即可启用, 如 entity_cache = EntityCache(...),
+    子类定义时由 BaseService.__init_subclass__ 调用 bind: 绑定 service, name 默认取表名, 并登记到该扩展类型的 instances
+    """
+
+    instances: list = []  # 每个直接继承的扩展类型各有一份, 用于后台任务与监控接口遍历
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if ServiceExtension in cls.__bases__:
+            cls.instances = []
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self.service = None  # 绑定的 BaseService 子类
+
+    def bind(self, service):
+        self.service = service
+        if self.name is None:
+            self.name = service.model.__tablename__
+        if self not in self.instances:
+            self.instances.append(self)
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    @classmethod
+    def all_stats(cls) -> list[dict]:
+        return [extension.stats() for extension in cls.instances]
@@ -0,0 +1,137 @@
+import logging
+import re
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+from config import settings
+from core.global_context import current_route, current_service_method
+from utils import current_timestamp
+
+logger = logging.getLogger(__name__)
+
+# IN (?, ?, ?) 的占位符个数随参数变化, 规范化时合并为一个
+_IN_PLACEHOLDERS = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAIN_PREFIX = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "mysql": "EXPLAIN ",
+    "postgresql": "EXPLAIN ",
+}
+
+
+def normalize_sql(statement: str) -> str:
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _IN_PLACEHOLDERS.sub("(?...)", statement)
+
+
+def params_shape(parameters, executemany: bool) -> str:
+    """参数的结构(类型), 不记录参数值"""
+    if executemany:
+        return f"executemany x{len(parameters)}"
+    if isinstance(parameters, dict):
+        return ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items())
+    if isinstance(parameters, (list, tuple)):
+        return ", ".join(type(value).__name__ for value in parameters)
+    return type(parameters).__name__
+
+
+@contextmanager
+def track_service_method(name: str):
+    """
+    标记当前执行的 BaseService 方法, 慢查询记录中据此定位来源
+    嵌套调用时保留最外层的方法
+    """
+    if current_service_method.get() is not None:
+        yield
+        return
+    token = current_service_method.set(name)
+    try:
+        yield
+    finally:
+        current_service_method.reset(token)
+
+
+class SlowQueryLog:
+    """
+    慢查询记录: 最近的慢查询(定长环形缓冲) + 按规范化 SQL 汇总的语句形状
+    总耗时排在前 explain_top 的 SELECT 形状, 首次出现时在同一连接上执行一次 EXPLAIN 并缓存结果
+    """
+
+    def __init__(self, threshold_ms: float = 200, maxlen: int = 500, explain: bool = True, explain_top: int = 10,
+                 max_shapes: int = 1000):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.explain_top = explain_top
+        self.max_shapes = max_shapes
+        self._records = deque(maxlen=maxlen)
+        self._shapes: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, conn, statement: str, parameters, executemany: bool, elapsed_ms: float,
+                stream_results: bool = False):
+        """
+        stream_results: 语句使用服务端游标(yield_per / stream_results), 结果尚未读完,
+        此时在同一连接上执行 EXPLAIN 会使驱动丢弃剩余结果(如 aiomysql 的 SSCursor), 因此跳过, 留给之后的非流式执行
+        """
+        if elapsed_ms < self.threshold_ms:
+            return
+        sql = normalize_sql(statement)
+        record = {
+            "sql": sql,
+            "params_shape": params_shape(parameters, executemany),
+            "duration_ms": elapsed_ms,
+            "route": current_route.get(),
+            "service_method": current_service_method.get(),
+            "timestamp": current_timestamp(),
+        }
+        with self._lock:
+            self._records.append(record)
+            shape = self._shapes.get(sql)
+            if shape is None:
+                if len(self._shapes) >= self.max_shapes:
+                    # 淘汰总耗时最少的形状
+                    self._shapes.pop(min(self._shapes, key=lambda key: self._shapes[key]["total_ms"]))
+                shape = self._shapes[sql] = {"sql": sql, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                             "explain": None}
+            shape["count"] += 1
+            shape["total_ms"] += elapsed_ms
+            shape["max_ms"] = max(shape["max_ms"], elapsed_ms)
+            need_explain = self.explain and not executemany and not stream_results and shape["explain"] is None \
+                and sql.upper().startswith("SELECT") and self._is_top(sql)
+            if need_explain:
+                shape["explain"] = []
+        logger.warning("慢查询 %.1fms [%s] [%s] %s", elapsed_ms, record["route"], record["service_method"], sql)
+        if need_explain:
+            shape["explain"] = self._run_explain(conn, statement, parameters)
+
+    def _is_top(self, sql: str) -> bool:
+        top = sorted(self._shapes.values(), key=lambda shape: shape["total_ms"], reverse=True)[:self.explain_top]
+        return any(shape["sql"] == sql for shape in top)
+
+    @staticmethod
+    def _run_explain(conn, statement: str, parameters) -> list[str]:
+        prefix = _EXPLAIN_PREFIX.get(conn.dialect.name)
+        if prefix is None:
+            return [f"不支持 {conn.dialect.name} 的 EXPLAIN"]
+        # 直接使用 DBAPI 游标, 不经过 SQLAlchemy 的执行事件
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [" | ".join(str(value) for value in row) for row in cursor.fetchall()]
+        except Exception as e:
+            return [f"EXPLAIN 失败: {e}"]
+        finally:
+            cursor.close()
+
+    def stats(self, limit: Optional[int] = None) -> dict:
+        with self._lock:
+            records = list(self._records)[::-1][:limit]
+            shapes = sorted(self._shapes.values(), key=lambda shape: shape["total_ms"], reverse=True)
+            top = [{**shape, "avg_ms": shape["total_ms"] / shape["count"]} for shape in shapes[:self.explain_top]]
+        return {"threshold_ms": self.threshold_ms, "recent": records, "top": top}
+
+
+slow_query_log = SlowQueryLog(threshold_ms=settings.slow_query_threshold_ms, maxlen=settings.slow_query_log_size,
+                              explain=settings.slow_query_explain, explain_top=settings.slow_query_explain_top)
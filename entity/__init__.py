@@ -1,121 +1,221 @@
 import functools
 import inspect
-from contextlib import asynccontextmanager
-from typing import Any, ParamSpec, TypeVar, Callable
+import itertools
+import logging
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import ParamSpec, TypeVar, Callable
 
-from sqlalchemy import Executable, Result, and_, Select, Delete, Update
+from sqlalchemy import Select, Update, event, column, and_
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.sql.selectable import Subquery
+from sqlalchemy.orm import Session, ORMExecuteState, with_loader_criteria
+from sqlalchemy.sql.selectable import Alias, Join, TableClause
 
 from common.constant import Constant
 from common.global_enums import IsDelete
 from config import settings
+from core.db_metrics import InstrumentedPool, instrument_engine, pool_options
+from core.global_context import current_session, force_primary
+from core.slow_query import track_service_method
+from entity.base_entity import DbBaseModel
 
 P = ParamSpec('P')
 T = TypeVar('T')
 
-engine = create_async_engine(settings.database_url, echo=False,  # 打印SQL日志（生产环境建议关闭）
-                             pool_size=10,  # 连接池大小
-                             max_overflow=20,  # 最大溢出连接数
-                             pool_recycle=3600,  # 连接回收时间（秒），解决MySQL超时断开问题【4†source】【5†source】
-                             )
 
+def _create_engine(url: str, name: str):
+    """
+    按 db_pool_profile 预设与 db_pool 中的覆盖项创建引擎, 并注册连接池与语句耗时监控
+    """
+    async_engine = create_async_engine(url, echo=False,  # 打印SQL日志（生产环境建议关闭）
+                                       poolclass=InstrumentedPool,
+                                       **pool_options(settings.db_pool_profile, settings.db_pool))
+    instrument_engine(name, settings.db_pool_profile, async_engine)
+    return async_engine
 
-# 创建异步会话工厂
 
+engine = _create_engine(settings.database_url, "primary")
+# 只读副本, 未配置时所有语句都走主库
+replica_engines = [_create_engine(url, f"replica-{i}") for i, url in enumerate(settings.database_replica_urls)]
+_replica_cycle = itertools.cycle(replica_engines)
+
+# session.info 中的标记: 本 session 已经写过数据, 之后的读也走主库(读己之写)
+_STICKY_PRIMARY = "sticky_primary"
+
+
+def _choose_replica():
+    if settings.database_replica_strategy == "least_connections":
+        return min(replica_engines, key=lambda replica: replica.pool.checkedout())
+    return next(_replica_cycle)
+
+
+class EnhanceSession(Session):
+    """
+    同步 Session, 逻辑删除通过 do_orm_execute 事件实现(见 _soft_delete_on_execute)
+    配置了只读副本时, 普通 Select 路由到副本, 其余语句走主库
+    以下情况 Select 也走主库:
+      1. 本 session 已经 flush 或执行过写语句(读己之写)
+      2. SELECT ... FOR UPDATE
+      3. 单次调用传入 bind_arguments={"use_primary": True}, 或处于 read_from_primary() 中
+    BaseService 中结果要回填进程内缓存的读取(实体缓存、存在性否定结果缓存、总数缓存)都以 use_primary 读主库,
+    否则写操作提交并失效缓存后, 从延迟的副本读到的旧数据会被重新缓存
+    """
+
+    def get_bind(self, mapper=None, clause=None, use_primary: bool = False, **kw):
+        if replica_engines and isinstance(clause, Select):
+            if not (use_primary or self.info.get(_STICKY_PRIMARY) or force_primary.get()
+                    or clause._for_update_arg is not None):
+                return _choose_replica().sync_engine
+        elif clause is not None:
+            # 写语句(或无法判断是否只读的文本语句)之后, 本 session 的读都走主库
+            self.info[_STICKY_PRIMARY] = True
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@event.listens_for(EnhanceSession, "after_flush")
+def _stick_to_primary_after_flush(session: Session, flush_context):
+    session.info[_STICKY_PRIMARY] = True
+
+
+_AFTER_COMMIT_CALLBACKS = "after_commit_callbacks"
+
+
+def call_after_commit(session, callback: Callable[[], None]):
+    """
+    注册在 session 当前事务提交后执行的回调(如缓存失效), 事务回滚时丢弃
+    写操作在提交前使缓存失效后, 其他请求仍可能读到已提交的旧数据并回填, 提交后需要再失效一次
+    """
+    sync_session = session.sync_session if isinstance(session, AsyncSession) else session
+    sync_session.info.setdefault(_AFTER_COMMIT_CALLBACKS, []).append(callback)
+
+
+@event.listens_for(EnhanceSession, "after_commit")
+def _run_after_commit_callbacks(session: Session):
+    for callback in session.info.pop(_AFTER_COMMIT_CALLBACKS, []):
+        try:
+            callback()
+        except Exception:
+            logging.exception("事务提交后的回调执行失败")
+
+
+@event.listens_for(EnhanceSession, "after_rollback")
+def _discard_after_commit_callbacks(session: Session):
+    session.info.pop(_AFTER_COMMIT_CALLBACKS, None)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    期间的查询都走主库, 用于必须读到最新数据的场景:
+
+    with read_from_primary():
+        user = await UserService.get_by_id(pid)
+    """
+    token = force_primary.set(True)
+    try:
+        yield
+    finally:
+        force_primary.reset(token)
+
+
+def _logical_delete_column(cls):
+    # DbBaseModel 本身未映射, SQLAlchemy 解析 lambda 时会以它调用一次, 此时返回同名的占位列
+    if hasattr(cls, "__table__"):
+        return cls.__table__.c[Constant.LOGICAL_DELETE_FIELD]
+    return column(Constant.LOGICAL_DELETE_FIELD)
+
+
+# 逻辑删除过滤条件, 对所有继承 DbBaseModel 的实体生效(包括别名、子查询、连表和关联加载)
+# 条件以 lambda 形式声明, 只在首次遇到某种语句结构时解析, 之后随编译缓存复用, 不再逐条遍历语句树
+_SOFT_DELETE_CRITERIA = with_loader_criteria(
+    DbBaseModel,
+    lambda cls: _logical_delete_column(cls) == IsDelete.NO_DELETE,
+    include_aliases=True,
+)
 
-class EnhanceAsyncSession(AsyncSession):
 
-    def _add_logical_delete_condition(self, statement: Select) -> Select:
-        """
-        为 Select 语句添加逻辑删除条件
-        支持递归处理 fastapi-pagination 生成的子查询包装
-        """
-        # 特殊处理：如果当前查询只有一个子查询，直接修改其内部元素
-        # 这样可以避免产生重复的别名
-        if len(statement.froms) == 1 and isinstance(statement.froms[0], Subquery):
-            subquery = statement.froms[0]
-            # 递归处理子查询内部
-            processed_inner = self._add_logical_delete_condition(subquery.element)
-            # 如果内部有修改，直接替换 subquery 的 element
-            if processed_inner is not subquery.element:
-                subquery.element = processed_inner
-            return statement
-
-        # 处理当前层的表
-        delete_condition = None
-        delete_field = Constant.LOGICAL_DELETE_FIELD
-
-        for from_obj in statement.froms:
-            # 跳过子查询（因为会通过上面的逻辑递归处理）
-            if isinstance(from_obj, Subquery):
-                continue
-
-            # 只处理 Table 对象
-            if hasattr(from_obj, 'columns') and delete_field in from_obj.columns:
-                # 使用表对象上的列
-                condition = from_obj.columns[delete_field] == IsDelete.NO_DELETE
-
-                if delete_condition is None:
-                    delete_condition = condition
-                else:
-                    delete_condition = and_(delete_condition, condition)
-
-        # 如果有条件，则应用到当前 statement
-        if delete_condition is not None:
-            existing_condition = statement.whereclause
-            if existing_condition is not None:
-                new_condition = and_(existing_condition, delete_condition)
-            else:
-                new_condition = delete_condition
-
-            statement = statement.where(new_condition)
-
-        return statement
-
-    async def scalar(self, statement: Executable, params=None, *, execution_options=None, bind_arguments=None,
-                     **kw: Any, ):
-        sig = inspect.signature(super().scalar)
-        if execution_options is None:
-            default_execution_options = sig.parameters['execution_options'].default
-            execution_options = default_execution_options
-
-        # 只对 Select 语句添加逻辑删除条件
-        if isinstance(statement, Select):
-            statement = self._add_logical_delete_condition(statement)
-
-        return await super().scalar(statement, params, execution_options=execution_options,
-                                    bind_arguments=bind_arguments, **kw)
-
-    async def execute(self, statement: Executable, params=None, *, execution_options=None, bind_arguments=None,
-                      **kw: Any, ) -> Result[Any]:
-        sig = inspect.signature(super().execute)
-        if execution_options is None:
-            default_execution_options = sig.parameters['execution_options'].default
-            execution_options = default_execution_options
-
-        if isinstance(statement, Select):
-            statement = self._add_logical_delete_condition(statement)
-
-        if isinstance(statement, Delete):
-            skip_soft_delete = execution_options and execution_options.get("skip_soft_delete", False)
-
-            if not skip_soft_delete:
-                table = statement.table
-
-                if hasattr(table, 'columns') and Constant.LOGICAL_DELETE_FIELD in table.columns:
-                    update_stmt = (Update(table).where(statement.whereclause).values(
-                        **{Constant.LOGICAL_DELETE_FIELD: IsDelete.DELETE}))
-
-                    if statement._returning:
-                        update_stmt = update_stmt.returning(*statement._returning)
-
-                    return await super().execute(update_stmt, params=params, execution_options=execution_options,
-                                                 bind_arguments=bind_arguments, **kw)
-
-        result = await super().execute(statement, params=params, execution_options=execution_options,
-                                       bind_arguments=bind_arguments, **kw, )
-        return result
+def with_soft_delete(stmt):
+    """
+    为查询语句预先附加逻辑删除过滤条件
+    用于长期复用的语句模板, 执行时事件发现条件已存在就不再复制语句
+    语句已设置执行选项 skip_soft_delete=True 时原样返回
+    """
+    if _SOFT_DELETE_CRITERIA in stmt._with_options or stmt.get_execution_options().get("skip_soft_delete", False):
+        return stmt
+    return stmt.options(_SOFT_DELETE_CRITERIA)
+
+
+# 直接以 Table 构造的 Core 查询 -> 附加了逻辑删除条件的语句, 长期复用的语句对象只改写一次
+_core_soft_delete_statements: "weakref.WeakKeyDictionary[Select, Select]" = weakref.WeakKeyDictionary()
+
+
+def _soft_delete_tables(from_obj) -> list:
+    """FROM 中带逻辑删除字段的表(或表的别名); 外连接只取左侧, 右侧的条件放在 WHERE 中会改变连接语义"""
+    if isinstance(from_obj, Join):
+        tables = _soft_delete_tables(from_obj.left)
+        if not from_obj.isouter:
+            tables += _soft_delete_tables(from_obj.right)
+        return tables
+    if isinstance(from_obj, TableClause) or isinstance(from_obj, Alias) and isinstance(from_obj.element, TableClause):
+        if Constant.LOGICAL_DELETE_FIELD in from_obj.c:
+            return [from_obj]
+    return []
+
+
+def _core_soft_delete(statement: Select) -> Select:
+    """
+    Core 查询(select(...).select_from(Model.__table__) 等)不包含 ORM 实体, with_loader_criteria 不生效,
+    按 FROM 中的表逐个追加条件; 子查询内部与外连接的右侧不处理, 需要时在语句中自行过滤
+    """
+    filtered = _core_soft_delete_statements.get(statement)
+    if filtered is None:
+        tables = [table for from_obj in statement.get_final_froms() for table in _soft_delete_tables(from_obj)]
+        filtered = statement
+        if tables:
+            filtered = statement.where(
+                and_(*(table.c[Constant.LOGICAL_DELETE_FIELD] == IsDelete.NO_DELETE for table in tables)))
+        _core_soft_delete_statements[statement] = filtered
+    return filtered
+
+
+@event.listens_for(EnhanceSession, "do_orm_execute")
+def _soft_delete_on_execute(orm_execute_state: ORMExecuteState):
+    """
+    查询: 附加逻辑删除过滤条件, ORM 查询通过 with_loader_criteria, Core 查询见 _core_soft_delete
+    删除: 改写为 UPDATE ... SET is_deleted = 1
+    执行选项 skip_soft_delete=True 时跳过(可设置在语句上或执行时传入)
+    """
+    if orm_execute_state.execution_options.get("skip_soft_delete", False):
+        return None
+
+    if orm_execute_state.is_select:
+        # 刷新过期属性的列加载不过滤, 否则已加载的对象无法刷新
+        # 已预先附加过滤条件的语句(缓存的语句模板)不再复制, 以保留其已计算的缓存键
+        statement = orm_execute_state.statement
+        if not orm_execute_state.is_orm_statement:
+            if isinstance(statement, Select):
+                orm_execute_state.statement = _core_soft_delete(statement)
+            return None
+        if not orm_execute_state.is_column_load and _SOFT_DELETE_CRITERIA not in statement._with_options:
+            orm_execute_state.statement = statement.options(_SOFT_DELETE_CRITERIA)
+        return None
+
+    if orm_execute_state.is_delete:
+        statement = orm_execute_state.statement
+        table = statement.table
+        if Constant.LOGICAL_DELETE_FIELD not in table.columns:
+            return None
+        update_stmt = Update(table).values(**{Constant.LOGICAL_DELETE_FIELD: IsDelete.DELETE})
+        if statement.whereclause is not None:
+            update_stmt = update_stmt.where(statement.whereclause)
+        if statement._returning:
+            update_stmt = update_stmt.returning(*statement._returning)
+        return orm_execute_state.invoke_statement(statement=update_stmt)
+    return None
+
+
+class EnhanceAsyncSession(AsyncSession):
+    sync_session_class = EnhanceSession
 
     def delete(self, instance):
         from sqlalchemy import inspect as sqlalchemy_inspect
@@ -130,6 +230,7 @@ class EnhanceAsyncSession(AsyncSession):
             super().delete(instance)
 
 
+# 创建异步会话工厂
 AsyncSessionLocal = async_sessionmaker(bind=engine, class_=EnhanceAsyncSession, expire_on_commit=False,  # 提交后不使对象过期
                                        autoflush=False  # 禁用自动刷新
                                        )
@@ -147,6 +248,7 @@ async def get_db_session():
 def with_db_session(session_param_name: str = "session"):
     """
     一个装饰器，用于为异步函数自动注入数据库会话。
+    处于工作单元(unit_of_work)中时注入请求级会话, 由工作单元统一提交, 否则创建新会话并独立提交。
 
     Args:
         session_param_name: 被装饰函数中，用于接收会话的参数名，默认为 'session'。
@@ -159,20 +261,79 @@ def with_db_session(session_param_name: str = "session"):
 
         @functools.wraps(func)
         async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-            # 如果调用时已经手动传了 session，就直接用
-            if session_param_name in kwargs:
-                return await func(*args, **kwargs)
-
-            # 否则，创建一个新 session 并注入
-            async with get_db_session() as session:
-                kwargs[session_param_name] = session
-                return await func(*args, **kwargs)
+            # 记录调用的服务方法(类方法取实际的子类名), 用于慢查询定位来源
+            owner = args[0].__name__ + "." if args and isinstance(args[0], type) else ""
+            with track_service_method(owner + func.__name__):
+                # 如果调用时已经手动传了 session，就直接用
+                if kwargs.get(session_param_name) is not None:
+                    return await func(*args, **kwargs)
+
+                # 处于工作单元中，复用请求级 session
+                ambient_session = current_session.get()
+                if ambient_session is not None:
+                    kwargs[session_param_name] = ambient_session
+                    return await func(*args, **kwargs)
+
+                # 否则，创建一个新 session 并注入
+                async with get_db_session() as session:
+                    kwargs[session_param_name] = session
+                    return await func(*args, **kwargs)
 
         return wrapper
 
     return decorator
 
 
+@asynccontextmanager
+async def unit_of_work_session():
+    """
+    工作单元: 期间所有 with_db_session 注入同一个 session, 共用一个连接和一个事务, 正常结束时提交, 异常时回滚
+    session 在第一次执行语句时才获取连接, 未访问数据库则不占用连接
+    已处于工作单元中时直接复用外层 session
+    """
+    existing_session = current_session.get()
+    if existing_session is not None:
+        yield existing_session
+        return
+
+    async with AsyncSessionLocal() as session:
+        token = current_session.set(session)
+        try:
+            yield session
+            if session.in_transaction():
+                await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
+        finally:
+            current_session.reset(token)
+
+
+def unit_of_work(func: Callable[P, T]) -> Callable[P, T]:
+    """
+    路由级工作单元装饰器, 按需开启:
+
+    @router.put("/xxx")
+    @unified_resp
+    @unit_of_work
+    async def update(req: XxxReq):
+        ...
+
+    注意: 同一个 session 不支持并发使用, 工作单元内不要用 asyncio.gather 并发调用服务方法(get_by_id 的批量加载除外)
+    """
+    if not inspect.iscoroutinefunction(func):
+        raise TypeError("`unit_of_work` can only be used on async functions.")
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        async with unit_of_work_session():
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
 # 关闭引擎
 async def close_engine():
     await engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
@@ -1,15 +1,45 @@
-from sqlalchemy import Column, BigInteger, Select, Delete, Update
+from sqlalchemy import Column, BigInteger, Select, Delete, Update, Index, event, text
 
 from common.global_enums import IsDelete
-from utils import current_timestamp, get_uuid
+from entity.id_types import new_id, id_field_kwargs
+from utils import current_timestamp
 
 # 上下文变量，控制是否启用逻辑删除过滤
 _SOFT_DELETE_ENABLED = True
 from sqlmodel import SQLModel, Field
 
 
+class CompositeIndex:
+    """
+    组合索引声明, 写在 DbBaseModel 子类的 __indexes__ 中, 随建表一起创建:
+
+    class User(DbBaseModel, table=True):
+        __indexes__ = [CompositeIndex("username", "is_deleted", "created_time")]
+
+    where: 部分索引条件(SQL 文本), PostgreSQL / SQLite 生效; MySQL 不支持部分索引, 退化为普通索引
+    """
+
+    def __init__(self, *columns: str, name: str = None, unique: bool = False, where: str = None):
+        self.columns = columns
+        self.name = name
+        self.unique = unique
+        self.where = where
+
+    def index_name(self, table_name: str) -> str:
+        # MySQL 索引名最长 64 个字符
+        return self.name or f"ix_{table_name}_{'_'.join(self.columns)}"[:64]
+
+    def build(self, table) -> Index:
+        dialect_kwargs = {}
+        if self.where:
+            dialect_kwargs = {"postgresql_where": text(self.where), "sqlite_where": text(self.where)}
+        return Index(self.index_name(table.name), *(table.c[column] for column in self.columns), unique=self.unique,
+                     **dialect_kwargs)
+
+
 class DbBaseModel(SQLModel, table=False):
-    id: str = Field(default_factory=get_uuid, max_length=32, primary_key=True)
+    # id 的生成策略与存储类型见 settings.id_strategy / id_storage, Python 侧始终为字符串
+    id: str = Field(default_factory=new_id, max_length=32, primary_key=True, **id_field_kwargs)
     created_time: int = Field(
         default_factory=current_timestamp,
         sa_type=BigInteger,
@@ -25,6 +55,13 @@ class DbBaseModel(SQLModel, table=False):
     # updated_by = CharField(max_length=32)
     is_deleted: int = Field(default=IsDelete.NO_DELETE)
 
+    # 所有实体默认创建的索引: 查询默认过滤 is_deleted 并按 created_time 排序(游标分页再按 id), 走索引范围扫描而不是排序
+    # (updated_time, id) 用于增量同步(BaseService.get_changes)
+    # 子类可以覆盖为空列表以取消
+    __default_indexes__ = [CompositeIndex("is_deleted", "created_time", "id"), CompositeIndex("updated_time", "id")]
+    # 子类声明的组合索引 / 部分索引
+    __indexes__ = []
+
     # class Config:
     #     arbitrary_types_allowed = True
     @classmethod
@@ -46,3 +83,13 @@ class DbBaseModel(SQLModel, table=False):
     def update_by_ids(cls, ids: list[str],update_dict: dict):
         update_dict.pop("id",None)
         return Update(cls).where(cls.id.in_(ids)).values(**update_dict)
+
+
+@event.listens_for(DbBaseModel, "instrument_class", propagate=True)
+def _create_declared_indexes(mapper, cls):
+    """实体映射时把声明的索引加到表上, 同名索引只创建一次"""
+    table = cls.__table__
+    existing = {index.name for index in table.indexes}
+    for spec in [*cls.__default_indexes__, *cls.__indexes__]:
+        if spec.index_name(table.name) not in existing:
+            spec.build(table)
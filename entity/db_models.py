@@ -1,17 +1,17 @@
-from sqlmodel import SQLModel
-
 from common.global_enums import UserRoleEnum
 from entity import DbBaseModel, engine
+from entity.base_entity import CompositeIndex
+from entity.schema_version import sync_schema
 
 
-# 初始化数据库表（异步执行）
+# 初始化数据库表（异步执行）, 表结构指纹未变化时跳过
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+    await sync_schema(engine)
 
 
 class User(DbBaseModel, table=True):
     __tablename__ = "user"  # 可以显式指定数据库表名，默认实体名转小写
+    __indexes__ = [CompositeIndex("username", "is_deleted", "created_time", "id")]
     username: str
     password: str
     user_role: UserRoleEnum
@@ -3,7 +3,11 @@ from typing import Union
 
 from pydantic import BaseModel, Field
 
+from common.constant import Constant
+
 T = TypeVar('T')
+CreateT = TypeVar('CreateT')
+UpdateT = TypeVar('UpdateT')
 
 class BaseTabelDto(BaseModel):
     id: Optional[str] = None
@@ -19,8 +23,16 @@ class BaseQueryReq(BaseTabelDto):
 
 
 class BasePageQueryReq(BaseQueryReq):
-    page_number: Optional[int] = Field(default=1, description="第几页")
-    page_size: Optional[int] = Field(default=12, description="一页多少条")
+    page_number: Optional[int] = Field(default=1, ge=1, description="第几页")
+    page_size: Optional[int] = Field(default=Constant.DEFAULT_PAGE_SIZE, ge=1, le=Constant.MAX_PAGE_SIZE,
+                                     description="一页多少条")
+    page_mode: Optional[str] = Field(default="offset", description="分页模式 offset 或 cursor")
+    cursor: Optional[str] = Field(default=None, description="游标分页模式下的翻页游标，首页不传")
+    count_mode: Optional[str] = Field(default="exact", description="总数统计方式 exact/cached/estimate/none")
+
+
+class BaseExportReq(BaseQueryReq):
+    fmt: Optional[str] = Field(default="ndjson", description="导出格式 ndjson 或 csv")
 
 
 class BaseRenameReq(BaseModel):
@@ -28,6 +40,37 @@ class BaseRenameReq(BaseModel):
     name: str
 
 
+class BaseBatchReq(BaseModel, Generic[CreateT, UpdateT]):
+    create: List[CreateT] = Field(default=[], description="新增的数据")
+    update: List[UpdateT] = Field(default=[], description="更新的数据, 需包含 id, 未传的字段不修改")
+    delete: List[str] = Field(default=[], description="删除的数据 id")
+
+
+class BatchItemResult(BaseModel):
+    op: str  # create / update / delete
+    index: int  # 在请求对应数组中的下标
+    id: Optional[str]
+    success: bool
+    msg: Optional[str] = None
+
+
+class BatchResp(BaseModel):
+    created: int
+    updated: int
+    deleted: int
+    failed: int
+    results: List[BatchItemResult]
+
+
+class BaseChangesResp(BaseModel, Generic[T]):
+    data: List[T]  # 按 (updated_time, id) 升序, is_deleted 为 1 的是删除标记
+    next_cursor: Optional[str]  # 下次同步传入的游标
+    has_more: bool  # 是否还有未返回的变更, 为 True 时应立即继续拉取
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
 class BasePageResp(BaseModel, Generic[T]):
     page_number: Optional[int]
     page_size: Optional[int]
@@ -36,6 +79,9 @@ class BasePageResp(BaseModel, Generic[T]):
     orderby: Optional[str]
     count: Optional[int]
     data: Optional[List[T]]
+    has_next: Optional[bool] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
     class Config:
         arbitrary_types_allowed = True
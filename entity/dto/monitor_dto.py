@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Dict, Optional
 
 from pydantic import BaseModel
 
@@ -56,3 +56,120 @@ class ServerInfo(BaseModel):
     system: SystemInfo
     disks: List[DiskInfo]
     python: PythonEnvInfo
+
+
+class EntityCacheInfo(BaseModel):
+    name: str
+    size: int  # 缓存条数
+    bytes: int  # 估算占用字节
+    max_bytes: int
+    ttl: int  # 秒
+    hits: int
+    misses: int
+    evictions: int  # 超出容量被淘汰的条数
+
+
+class DbPoolInfo(BaseModel):
+    name: str  # primary / replica-N
+    profile: str  # 连接池预设
+    pool_size: int
+    max_overflow: int
+    timeout: float  # 秒
+    checked_out: int  # 已借出的连接数
+    checked_in: int  # 池中空闲的连接数
+    overflow: int  # 当前溢出连接数
+    waiting: int  # 正在等待连接的数量
+    checkouts: int
+    timeouts: int  # 等待连接超时的次数
+    wait_p50_ms: float
+    wait_p99_ms: float
+    wait_max_ms: float
+
+
+class StatementTimingInfo(BaseModel):
+    count: int
+    avg_ms: float
+    max_ms: float
+    buckets: Dict[str, int]  # 耗时区间 -> 语句数
+
+
+class ThreadLimiterInfo(BaseModel):
+    total_tokens: int  # 线程池令牌数(同步路由与依赖并发上限)
+    borrowed_tokens: int
+
+
+class DbMonitorInfo(BaseModel):
+    pools: List[DbPoolInfo]
+    statements: StatementTimingInfo
+    thread_limiter: ThreadLimiterInfo
+
+
+class SlowQueryRecord(BaseModel):
+    sql: str  # 规范化后的 SQL
+    params_shape: str  # 参数类型, 不含参数值
+    duration_ms: float
+    route: Optional[str]
+    service_method: Optional[str]
+    timestamp: int
+
+
+class SlowQueryShape(BaseModel):
+    sql: str
+    count: int
+    total_ms: float
+    avg_ms: float
+    max_ms: float
+    explain: Optional[List[str]]  # 执行计划, 未采集时为空
+
+
+class SlowQueryInfo(BaseModel):
+    threshold_ms: float
+    recent: List[SlowQueryRecord]  # 最近的慢查询, 新的在前
+    top: List[SlowQueryShape]  # 总耗时最高的语句形状
+
+
+class IndexAdvice(BaseModel):
+    table: str
+    filters: List[str]  # 等值过滤字段
+    orderby: Optional[str]
+    count: int  # 观察到的查询次数
+    columns: List[str]  # 建议的索引字段(按顺序)
+    ddl: str
+
+
+class WriteBehindInfo(BaseModel):
+    name: str
+    pending: int  # 队列中等待写入的行数
+    max_pending: int
+    submitted: int
+    flushed_rows: int
+    flushes: int  # 提交的批次数
+    failed_rows: int
+    avg_batch_rows: float
+    avg_flush_ms: float
+
+
+class BloomFilterInfo(BaseModel):
+    name: str
+    ready: bool  # 是否已加载完成且未过期
+    age_seconds: Optional[float]  # 距上次加载完成的秒数
+    refreshes: int
+    negatives: int  # 直接判断为不存在(未查库)的次数
+    columns: Dict[str, int]  # 字段 -> 已加入的取值数
+    capacity: int
+    error_rate: float
+
+
+class PurgeInfo(BaseModel):
+    name: str
+    days: int  # 保留天数
+    archive: bool  # 移入归档表(否则直接物理删除)
+    running: bool
+    runs: int
+    archived: int
+    deleted: int
+    last_run_rows: int
+    last_started: Optional[int]
+    last_finished: Optional[int]
+    last_error: Optional[str]
+    position: Optional[int]  # 本轮已处理到的 updated_time
@@ -1,8 +1,9 @@
 from typing import Optional
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 
-from entity.dto.base import BasePageQueryReq, BaseQueryReq
+from common.global_enums import UserRoleEnum
+from entity.dto.base import BasePageQueryReq, BaseQueryReq, BaseExportReq, BaseBatchReq
 
 
 class UserQueryReq(BaseQueryReq):
@@ -11,3 +12,24 @@ class UserQueryReq(BaseQueryReq):
 
 class UserQueryPageReq(UserQueryReq, BasePageQueryReq):
     pass
+
+
+class UserExportReq(UserQueryReq, BaseExportReq):
+    pass
+
+
+class UserCreateReq(BaseModel):
+    username: str = Field(description="名称")
+    password: str
+    user_role: UserRoleEnum = UserRoleEnum.USER
+
+
+class UserUpdateReq(BaseModel):
+    id: str
+    username: Optional[str] = Field(default=None, description="名称")
+    password: Optional[str] = None
+    user_role: Optional[UserRoleEnum] = None
+
+
+class UserBatchReq(BaseBatchReq[UserCreateReq, UserUpdateReq]):
+    pass
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import logging
+from typing import Optional
+
+from filelock import FileLock
+from sqlalchemy import BigInteger, Column, MetaData, String, Table, delete, insert, inspect, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlmodel import SQLModel
+
+from config import settings
+from utils import current_timestamp
+from utils.file_utils import get_project_base_directory
+
+logger = logging.getLogger(__name__)
+
+# 记录已建表结构指纹的表, 不属于 SQLModel.metadata, 不参与指纹计算
+schema_version_table = Table(
+    "schema_version", MetaData(),
+    Column("name", String(64), primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("updated_time", BigInteger, nullable=False),
+)
+SCHEMA_NAME = "default"
+# 同步逻辑本身变化时递增, 使已记录的指纹失效, 所有库重新同步一次(2: 为已存在的表补建缺失的索引)
+SYNC_VERSION = 2
+
+
+def schema_fingerprint(dialect) -> str:
+    """模型元数据的指纹: 按表名排序后, 对各表在当前方言下的建表与建索引语句取 sha256"""
+    digest = hashlib.sha256(f"{SYNC_VERSION}:{dialect.name}".encode("utf-8"))
+    for table in sorted(SQLModel.metadata.tables.values(), key=lambda t: t.name):
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode("utf-8"))
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def stored_fingerprint(engine) -> Optional[str]:
+    """读取已记录的指纹, 记录表不存在(首次启动)时返回 None"""
+    try:
+        async with engine.connect() as conn:
+            return await conn.scalar(
+                select(schema_version_table.c.fingerprint).where(schema_version_table.c.name == SCHEMA_NAME))
+    except DBAPIError:
+        return None
+
+
+async def sync_schema(engine):
+    """
+    表结构指纹未变化时只执行一次查询, 跳过 create_all 对每张表的反射检查
+    开启 db_init_lock 时同一台机器上只有一个 worker 执行建表, 其他 worker 等待后重新比对指纹
+    注意: 只会创建缺失的表和缺失的索引(按名称判断), 不会修改已存在的表结构与索引定义
+    """
+    fingerprint = schema_fingerprint(engine.dialect)
+    if await stored_fingerprint(engine) == fingerprint:
+        logger.info("表结构未变化, 跳过建表检查")
+        return
+    if not settings.db_init_lock:
+        await _create_all(engine, fingerprint)
+        return
+    # 获取文件锁是阻塞调用, 放到线程中等待, 释放在事件循环线程中进行, 因此不能使用默认的线程级锁
+    lock = FileLock(get_project_base_directory(".db_init.lock"), thread_local=False)
+    await asyncio.to_thread(lock.acquire, timeout=settings.db_init_lock_timeout)
+    try:
+        if await stored_fingerprint(engine) == fingerprint:
+            logger.info("表结构已由其他 worker 更新, 跳过建表检查")
+            return
+        await _create_all(engine, fingerprint)
+    finally:
+        lock.release()
+
+
+async def _create_all(engine, fingerprint: str):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(schema_version_table.create, checkfirst=True)
+        await conn.execute(delete(schema_version_table).where(schema_version_table.c.name == SCHEMA_NAME))
+        await conn.execute(insert(schema_version_table).values(name=SCHEMA_NAME, fingerprint=fingerprint,
+                                                               updated_time=current_timestamp()))
+    logger.info("已同步表结构, 指纹: %s", fingerprint)
+
+
+def _create_missing_indexes(sync_conn):
+    """create_all 跳过已存在的表, 其后新增声明的索引需要单独补建"""
+    inspector = inspect(sync_conn)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in existing:
+                index.create(sync_conn)
+                logger.info("已为表 %s 补建索引 %s", table.name, index.name)
@@ -6,6 +6,7 @@ from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
 from middleware.db_session import DbSessionMiddleWare
+from middleware.request_context import RequestContextMiddleWare
 beartype_this_package()
 
 def add_middleware(app: FastAPI):
@@ -18,6 +19,7 @@ def add_middleware(app: FastAPI):
         max_age=2592000
     )
     app.add_middleware(SessionMiddleware, secret_key=secrets.token_hex(32))
+    app.add_middleware(RequestContextMiddleWare)
     # app.add_middleware(DbSessionMiddleWare)  #不再需要
 
 
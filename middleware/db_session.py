@@ -1,22 +1,15 @@
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from core.global_context import current_session
-from entity import AsyncSessionLocal
+
+from entity import unit_of_work_session
+
 
 class DbSessionMiddleWare(BaseHTTPMiddleware):
-    async def dispatch(self,request: Request, call_next):
-        async with AsyncSessionLocal() as session:
-            # 设置会话到上下文变量
-            token = current_session.set(session)
-            try:
-                response = await call_next(request)
-                await session.commit()
-            except Exception:
-                await session.rollback()
-                raise
-            finally:
-                # 重置上下文变量
-                current_session.reset(token)
-                # 无论成功与否，都必须关闭会话
-                await session.close()
-        return response
\ No newline at end of file
+    """
+    为所有请求开启工作单元, 一般更推荐在需要的路由上使用 entity.unit_of_work 按需开启
+    session 在第一次执行语句时才获取连接, 不访问数据库的请求不会占用连接
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        async with unit_of_work_session():
+            return await call_next(request)
@@ -0,0 +1,43 @@
+import logging
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from config import settings
+from core.global_context import current_loaders, current_route, current_query_stats
+from core.query_stats import RequestQueryStats
+
+logger = logging.getLogger(__name__)
+
+
+class RequestContextMiddleWare(BaseHTTPMiddleware):
+    """初始化请求级上下文(批量加载器、当前路由、语句统计等), 请求结束后释放"""
+
+    async def dispatch(self, request: Request, call_next):
+        route = f"{request.method} {request.url.path}"
+        query_stats = RequestQueryStats()
+        token = current_loaders.set({})
+        route_token = current_route.set(route)
+        stats_token = current_query_stats.set(query_stats)
+        try:
+            response = await call_next(request)
+        finally:
+            current_query_stats.reset(stats_token)
+            current_route.reset(route_token)
+            current_loaders.reset(token)
+        # 流式响应在返回后才执行的语句不计入
+        if query_stats.count:
+            if settings.debug:
+                response.headers.append("Server-Timing", query_stats.server_timing())
+            self.report(route, query_stats)
+        return response
+
+    @staticmethod
+    def report(route: str, query_stats: RequestQueryStats):
+        duplicates = query_stats.duplicates(settings.request_query_warn_duplicates)
+        if query_stats.count < settings.request_query_warn_count \
+                and query_stats.total_ms < settings.request_query_warn_ms and not duplicates:
+            return
+        lines = [f"  x{count} {sql}" for sql, count in duplicates.items()]
+        logger.warning("请求 %s 执行了 %d 条语句, 数据库耗时 %.1fms, 重复执行的语句:\n%s", route, query_stats.count,
+                       query_stats.total_ms, "\n".join(lines) or "  无")
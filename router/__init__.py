@@ -1,20 +1,25 @@
+import csv
 import inspect
+import io
+import json
 import logging
 from datetime import datetime
 from functools import wraps
-from typing import Union, Type, Callable, TypeVar, get_type_hints
+from typing import Union, Type, Callable, TypeVar, get_type_hints, AsyncIterator
 
 import pytz
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
+from common.global_enums import ExportFormat
 from config import get_settings
 from entity.dto import HttpResp, ApiResponse
-from exceptions.base import AppException
-from utils import get_uuid
+from entity.dto.base import BaseBatchReq, BatchItemResult, BatchResp, BaseChangesResp
+from entity.id_types import new_id
+from exceptions.base import AppException, RetCode
 
-__all__ = ["unified_resp", "BaseController"]
+__all__ = ["unified_resp", "BaseController", "stream_export"]
 RT = TypeVar('RT')  # 返回类型
 
 
@@ -52,6 +57,40 @@ def unified_resp(func: Callable[..., RT]) -> Callable[..., RT]:
     return wrapper
 
 
+async def _ndjson_chunks(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield "".join(json.dumps(row.model_dump(mode="json"), ensure_ascii=False) + "\n" for row in batch).encode()
+
+
+async def _csv_chunks(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    header = None
+    async for batch in batches:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            data = row.model_dump(mode="json")
+            if header is None:
+                header = list(data.keys())
+                writer.writerow(header)
+            writer.writerow([data.get(k) for k in header])
+        yield buffer.getvalue().encode()
+
+
+def stream_export(batches: AsyncIterator[list], fmt: str = ExportFormat.NDJSON,
+                  filename: str = "export") -> StreamingResponse:
+    """
+    将按批产出的数据流式输出为 NDJSON 或 CSV, 边查边写, 不在内存中拼装完整结果
+    客户端断开时迭代被取消, 查询使用的连接随之释放
+    """
+    if fmt == ExportFormat.CSV:
+        return StreamingResponse(_csv_chunks(batches), media_type="text/csv;charset=utf-8",
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'})
+    if fmt == ExportFormat.NDJSON:
+        return StreamingResponse(_ndjson_chunks(batches), media_type="application/x-ndjson;charset=utf-8",
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'})
+    raise AppException(f"不支持的导出格式: {fmt}")
+
+
 class BaseController:
 
     def __init__(self, service):
@@ -73,6 +112,17 @@ class BaseController:
         return datas
 
 
+    async def base_export(self, req: Union[dict, BaseModel], fmt: str = ExportFormat.NDJSON,
+                          dto_class: Type[BaseModel] = None) -> StreamingResponse:
+        if not isinstance(req, dict):
+            req = req.model_dump()
+        batches = self.service.stream_list(req, dto_class)
+        return stream_export(batches, fmt, filename=self.service.model.__tablename__)
+
+    async def base_changes(self, cursor: str = None, limit: int = 100,
+                           dto_class: Type[BaseModel] = None) -> BaseChangesResp:
+        return await self.service.get_changes(cursor, limit, dto_class)
+
     async def get_by_id(self, id: str):
         result = await self.service.get_by_id(id)
         if not result:
@@ -82,7 +132,7 @@ class BaseController:
     async def add(self, req: Union[dict, BaseModel]):
         if not isinstance(req, dict):
             req = req.model_dump()
-        req["id"] = get_uuid()
+        req["id"] = new_id()
         try:
             return await self.service.save(**req)
         except Exception as e:
@@ -90,29 +140,63 @@ class BaseController:
             raise AppException(f"添加失败, error: {str(e)}")
 
     async def delete(self, id: str, db_query_data=None):
-        if db_query_data is None:
-            db_query_data = await self.service.get_by_id(id)
-            if not db_query_data:
-                raise AppException(f"数据不存在")
-        await self.service.check_base_permission(db_query_data)
+        """
+        存在性与权限检查由条件删除的 WHERE 完成, 一条语句即可; 0 行表示数据不存在或无权限
+        调用方已查出数据时仍先执行 check_base_permission
+        """
+        if db_query_data is not None:
+            await self.service.check_base_permission(db_query_data)
         try:
-            return await self.service.delete_by_id(id)
+            rowcount = await self.service.conditional_delete_by_id(id)
         except Exception as e:
             logging.exception(e)
             raise AppException(f"删除失败")
+        if not rowcount:
+            raise AppException(f"数据不存在")
+        return rowcount
 
     async def update(self, request: BaseModel, db_query_data=None):
+        """同 delete, 以一条条件更新完成存在性、权限检查与写入"""
         params = request.model_dump()
         req = {k: v for k, v in params.items() if v is not None}
         data_id = req.get("id")
-        if db_query_data is None:
-            db_query_data = await self.service.get_by_id(data_id)
-            if not db_query_data:
-                raise AppException(f"数据不存在")
-        await self.service.check_base_permission(db_query_data)
+        if db_query_data is not None:
+            await self.service.check_base_permission(db_query_data)
 
         try:
-            return await self.service.update_by_id(data_id, req)
+            rowcount = await self.service.conditional_update_by_id(data_id, req)
         except Exception as e:
             logging.exception(e)
             raise AppException(f"更新失败, error: {str(e)}")
+        if not rowcount:
+            raise AppException(f"数据不存在")
+        return rowcount
+
+    async def base_batch(self, req: BaseBatchReq) -> BatchResp:
+        """
+        批量新增 / 更新 / 删除, 在一个事务中以少量语句完成, 返回每一项的结果
+        更新和删除不存在(或无权限)的数据时该项失败, 不影响其他项; 数据库错误时整个批次回滚
+        """
+        total = len(req.create) + len(req.update) + len(req.delete)
+        max_items = get_settings().batch_max_items
+        if total > max_items:
+            raise AppException(f"批量操作最多 {max_items} 条, 当前 {total} 条", code=RetCode.ARGUMENT_ERROR)
+        creates = [item.model_dump() for item in req.create]
+        updates = [{k: v for k, v in item.model_dump().items() if v is not None} for item in req.update]
+        try:
+            result = await self.service.batch_write(creates, updates, req.delete)
+        except Exception as e:
+            logging.exception(e)
+            raise AppException(f"批量操作失败, error: {str(e)}")
+
+        results = [BatchItemResult(op="create", index=i, id=pid, success=True)
+                   for i, pid in enumerate(result["created"])]
+        for op, ids, done in (("update", [data["id"] for data in updates], result["updated"]),
+                              ("delete", req.delete, result["deleted"])):
+            results.extend(BatchItemResult(op=op, index=i, id=pid, success=pid in done,
+                                           msg=None if pid in done else "数据不存在")
+                           for i, pid in enumerate(ids))
+        updated = sum(1 for item in results if item.op == "update" and item.success)
+        deleted = sum(1 for item in results if item.op == "delete" and item.success)
+        return BatchResp(created=len(result["created"]), updated=updated, deleted=deleted,
+                         failed=sum(1 for item in results if not item.success), results=results)
@@ -1,8 +1,19 @@
 import logging
+from typing import List
 
+import anyio.to_thread
 from fastapi import APIRouter
 
-from entity.dto.monitor_dto import ServerInfo
+from core.db_metrics import db_pool_stats, statement_histogram
+from core.entity_cache import EntityCache
+from core.existence import ColumnBloomFilter
+from core.index_advisor import index_advisor
+from core.purge import RetentionPolicy
+from core.slow_query import slow_query_log
+from core.write_behind import WriteBehindQueue
+from entity.dto.monitor_dto import ServerInfo, EntityCacheInfo, DbMonitorInfo, DbPoolInfo, StatementTimingInfo, \
+    ThreadLimiterInfo, SlowQueryInfo, IndexAdvice, WriteBehindInfo, BloomFilterInfo, \
+    PurgeInfo
 from router import unified_resp
 from utils.server_info_utils import ServerInfoUtils
 
@@ -22,3 +33,57 @@ def monitor_server() -> ServerInfo:
         disks=ServerInfoUtils.get_disk_info(),
         python=ServerInfoUtils.get_py_info()
     )
+
+
+@router.get('/entity-cache', summary='实体缓存监控')
+@unified_resp
+def monitor_entity_cache() -> List[EntityCacheInfo]:
+    """各服务实体缓存的命中、未命中与淘汰统计"""
+    return [EntityCacheInfo(**stats) for stats in EntityCache.all_stats()]
+
+
+@router.get('/write-behind', summary='写缓冲队列监控')
+@unified_resp
+def monitor_write_behind() -> List[WriteBehindInfo]:
+    """各服务写缓冲队列的积压、批次大小与提交耗时"""
+    return [WriteBehindInfo(**stats) for stats in WriteBehindQueue.all_stats()]
+
+
+@router.get('/bloom-filter', summary='布隆过滤器监控')
+@unified_resp
+def monitor_bloom_filter() -> List[BloomFilterInfo]:
+    """各服务存在性判断布隆过滤器的加载状态与直接排除的次数"""
+    return [BloomFilterInfo(**stats) for stats in ColumnBloomFilter.all_stats()]
+
+
+@router.get('/purge', summary='已删除数据清理进度')
+@unified_resp
+def monitor_purge() -> List[PurgeInfo]:
+    """各模型已逻辑删除数据的归档 / 清理进度"""
+    return [PurgeInfo(**stats) for stats in RetentionPolicy.all_stats()]
+
+
+@router.get('/db', summary='数据库连接池监控')
+@unified_resp
+async def monitor_db() -> DbMonitorInfo:
+    """连接池使用与等待情况、语句耗时分布, 以及线程池令牌占用, 用于确定连接池大小"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return DbMonitorInfo(
+        pools=[DbPoolInfo(**stats) for stats in db_pool_stats()],
+        statements=StatementTimingInfo(**statement_histogram.stats()),
+        thread_limiter=ThreadLimiterInfo(total_tokens=limiter.total_tokens, borrowed_tokens=limiter.borrowed_tokens)
+    )
+
+
+@router.get('/slow-queries', summary='慢查询监控')
+@unified_resp
+def monitor_slow_queries(limit: int = 100) -> SlowQueryInfo:
+    """最近的慢查询及总耗时最高的语句形状(附执行计划)"""
+    return SlowQueryInfo(**slow_query_log.stats(limit))
+
+
+@router.get('/index-advice', summary='索引建议')
+@unified_resp
+def monitor_index_advice() -> List[IndexAdvice]:
+    """实际执行过、但没有匹配的组合索引的查询形状, 按查询次数倒序"""
+    return [IndexAdvice(**advice) for advice in index_advisor.advise()]
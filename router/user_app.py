@@ -1,10 +1,10 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, Query
 
 from entity.db_models import User
-from entity.dto.base import BasePageResp
-from entity.dto.user_dto import UserQueryPageReq, UserQueryReq
+from entity.dto.base import BasePageResp, BatchResp, BaseChangesResp
+from entity.dto.user_dto import UserQueryPageReq, UserQueryReq, UserExportReq, UserBatchReq
 from router import BaseController, unified_resp
 from service.user_service import UserService
 
@@ -21,3 +21,21 @@ async def get_page(req:UserQueryPageReq=Query(...)) -> BasePageResp[User]:
 @unified_resp
 async def get_list(req:UserQueryReq=Query(...))->List[User]:
     return await base_service.get_list(req)
+
+
+@router.get("/changes", summary="增量同步(自游标之后的变更, 含删除标记)")
+@unified_resp
+async def changes(cursor: Optional[str] = Query(default=None, description="上次返回的 next_cursor, 首次同步不传"),
+                  limit: int = Query(default=100, ge=1, le=1000)) -> BaseChangesResp[User]:
+    return await base_app.base_changes(cursor, limit)
+
+
+@router.get("/export", summary="流式导出(ndjson/csv)")
+async def export(req: UserExportReq = Query(...)):
+    return await base_app.base_export(req, req.fmt)
+
+
+@router.post("/batch", summary="批量新增/更新/删除")
+@unified_resp
+async def batch(req: UserBatchReq) -> BatchResp:
+    return await base_app.base_batch(req)
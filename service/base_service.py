@@ -1,15 +1,38 @@
-from typing import Union, Type, List, Any, TypeVar, Generic, Optional
+import asyncio
+import base64
+import json
+import logging
+import math
+import time
+from typing import Union, Type, List, Any, TypeVar, Generic, Optional, AsyncIterator, Callable
 
-from fastapi_pagination import Params
-from fastapi_pagination.ext.sqlalchemy import paginate
+from cachetools import LRUCache
 from pydantic import BaseModel
-from sqlalchemy import func
+from sqlalchemy import Select, func, or_, and_, select, text, insert, update, case, bindparam, tuple_, literal_column
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import SQLModel
 
-from entity import with_db_session
-from entity.dto.base import BasePageQueryReq, BasePageResp, BaseQueryReq
-from utils import get_uuid
+from common.constant import Constant
+from common.global_enums import CountMode, BulkUpdateStrategy, IsDelete
+from config import settings
+from core.count_cache import count_cache
+from core.data_loader import get_request_loader
+from core.entity_cache import EntityCache
+from core.existence import ColumnBloomFilter, negative_existence_cache
+from core.global_context import current_loaders, current_session
+from core.index_advisor import index_advisor
+from core.purge import RetentionPolicy, archive_table_for
+from core.service_extension import ServiceExtension
+from core.slow_query import track_service_method
+from core.write_behind import WriteBehindQueue
+from entity import with_db_session, get_db_session, with_soft_delete, call_after_commit
+from entity.dto.base import BasePageQueryReq, BasePageResp, BaseQueryReq, BaseChangesResp
+from exceptions.base import AppException, RetCode
+from utils import current_timestamp
 
 """
 session.execute： 执行任意数据库操作语句，返回结果需要额外处理获取 数据形式：Row对象（类似元组）
@@ -21,28 +44,243 @@ session.scalar: 直接明确获取一条数据，可以直接返回，无需额
 """
 T = TypeVar('T', bound=SQLModel)
 
+# 查询参数中的控制参数(排序、分页、导出格式等), 不作为过滤条件
+QUERY_CONTROL_KEYS = frozenset(
+    {"sort", "orderby", "limit", "page_number", "page_size", "page_mode", "cursor", "count_mode", "fmt"})
+
+
+def chunk_rows(rows: list[dict], batch_size: int, max_packet_bytes: int):
+    """
+    按行数和估算的语句字节数切分批次, 避免单条语句超过数据库的包大小限制(如 MySQL max_allowed_packet)
+    """
+    chunk, chunk_bytes = [], 0
+    for row in rows:
+        row_bytes = sum(len(str(v)) + 4 for v in row.values())
+        if chunk and (len(chunk) >= batch_size or chunk_bytes + row_bytes > max_packet_bytes):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(row)
+        chunk_bytes += row_bytes
+    if chunk:
+        yield chunk
+
+
+def case_update_stmt(table, rows: list[dict], columns: tuple):
+    """
+    按 id 批量更新的单条语句: UPDATE ... SET col = CASE WHEN id = ? THEN ? ... END WHERE id IN (...)
+    WHEN 条件与 THEN 值都按列类型绑定, 经过 HexBinary / DecimalBigInt 等类型转换后才能与主键比较
+    """
+    id_column = table.c.id
+    return update(table).where(id_column.in_([row["id"] for row in rows])).values(
+        {col: case(*[(id_column == row["id"], bindparam(None, row[col], type_=table.c[col].type)) for row in rows],
+                   else_=table.c[col])
+         for col in columns})
+
+
+def encode_cursor(orderby: str, sort: str, values: list, direction: str = "next") -> str:
+    """
+    生成游标: 记录排序字段、排序方式、(排序字段值, id) 以及翻页方向, 对调用方不透明
+    """
+    payload = {"o": orderby, "s": sort, "v": values, "d": direction}
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, orderby: str, sort: str) -> tuple[list, str]:
+    """
+    解析游标, 游标与当前查询的排序条件不一致时视为无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values, direction = payload["v"], payload["d"]
+    except Exception:
+        raise AppException("无效的分页游标", code=RetCode.ARGUMENT_ERROR)
+    if payload.get("o") != orderby or payload.get("s") != sort or direction not in ("next", "prev") \
+            or not isinstance(values, list) or len(values) != 2:
+        raise AppException("分页游标与当前排序条件不匹配", code=RetCode.ARGUMENT_ERROR)
+    return values, direction
+
 
 class BaseService(Generic[T]):
     model: Type[T]  # 子类必须指定模型
+    entity_cache: Optional[EntityCache] = None  # 子类设置后启用 get_by_id / get_by_ids 的实体缓存
+    write_behind: Optional[WriteBehindQueue] = None  # 子类设置后可通过 save_deferred 缓冲写入
+    bloom_filter: Optional[ColumnBloomFilter] = None  # 子类设置后 is_exist 先用布隆过滤器排除一定不存在的取值
+    retention: Optional[RetentionPolicy] = None  # 子类设置后由后台任务定期归档 / 清理已逻辑删除的数据
+
+    _columns: dict = {}  # 字段名 -> 模型列, 子类定义时预先计算
+    _templates: LRUCache = None  # 参数化语句模板缓存, 见 query_template
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get("model") is not None:
+            cls._columns = {name: getattr(cls.model, name) for name in cls.model.__table__.columns.keys()}
+            cls._templates = LRUCache(maxsize=settings.query_template_cache_size)
+        # 本类上设置的可选扩展(entity_cache、write_behind 等)绑定到本类并登记
+        for value in list(cls.__dict__.values()):
+            if isinstance(value, ServiceExtension):
+                value.bind(cls)
+
+    @classmethod
+    def split_query_params(cls, query_params: Union[dict, BaseModel, None]) -> tuple[dict, dict]:
+        """
+        拆分查询参数, 忽略空值
+        返回 (过滤条件{字段名: 值}, 控制参数{排序、分页等})
+        既不是模型字段也不是控制参数的键视为非法参数
+        """
+        if not query_params:
+            return {}, {}
+        if not isinstance(query_params, dict):
+            query_params = query_params.model_dump()
+        filters, options = {}, {}
+        for key, value in query_params.items():
+            if value is None or isinstance(value, str) and value == "":
+                continue
+            if not isinstance(key, str):
+                # 兼容直接以模型字段作为键
+                key = getattr(key, "key", None) if getattr(key, "class_", None) is cls.model else None
+            if key in cls._columns:
+                filters[key] = value
+            elif key in QUERY_CONTROL_KEYS:
+                options[key] = value
+            else:
+                raise AppException(f"不支持的查询参数: {key}", code=RetCode.ARGUMENT_ERROR)
+        return filters, options
+
+    @classmethod
+    def bind_values(cls, filters: dict) -> dict:
+        """过滤条件转为语句模板的绑定参数"""
+        return {f"f_{key}": value for key, value in filters.items()}
+
+    @classmethod
+    def order_options(cls, options: dict) -> tuple[str, str]:
+        """
+        返回 (orderby, sort), orderby 不是模型字段时回退到 created_time
+        """
+        sort = str(options.get("sort") or "desc").lower()
+        orderby = str(options.get("orderby") or "created_time").lower()
+        if orderby not in cls._columns:
+            orderby = "created_time"
+        return orderby, "asc" if sort == "asc" else "desc"
+
+    @classmethod
+    def _projection(cls, dto_model_class: Type[BaseModel] = None, fields: List = None) -> Optional[tuple]:
+        """
+        投影的字段名, dto_model_class 优先, 只保留模型中存在的字段(DTO 可能包含计算字段)
+        fields 中有非模型列(如聚合函数)时返回 False, 表示该语句不能缓存为模板
+        """
+        if dto_model_class is not None:
+            return tuple(key for key in dto_model_class.model_fields.keys() if key in cls._columns)
+        if fields:
+            names = tuple(getattr(field, "key", None) for field in fields)
+            if all(cls._columns.get(name) is field for name, field in zip(names, fields)):
+                return names
+            return False
+        return None
+
+    @classmethod
+    def _cached_template(cls, key: tuple, build: Callable[[], Select]) -> Select:
+        template = cls._templates.get(key)
+        if template is None:
+            template = cls._templates[key] = with_soft_delete(build())
+        return template
+
+    @classmethod
+    def query_template(cls, filter_keys: tuple = (), *, dto_model_class: Type[BaseModel] = None,
+                       fields: List = None, orderby: Optional[str] = None, sort: str = "desc",
+                       limit: bool = False) -> Select:
+        """
+        参数化的查询语句模板, 过滤条件以 bindparam(f_字段名) 占位, 执行时传入 bind_values 生成的绑定参数
+        模板按 (过滤字段, 投影, 排序, 是否 limit) 缓存, 同一形状的查询复用同一个语句对象
+        语句的缓存键只计算一次, 之后每次执行都直接命中 SQLAlchemy 的编译缓存
+        filter_keys: 已排序的过滤字段名; orderby 为 None 时不排序; limit 为 True 时以 p_limit 占位
+        """
+        index_advisor.observe(cls.model.__tablename__, filter_keys, orderby)
+        projection = cls._projection(dto_model_class, fields)
+
+        def build():
+            if projection:
+                stmt = cls.model.select([cls._columns[name] for name in projection])
+            elif projection is False:
+                stmt = cls.model.select(fields)
+            else:
+                stmt = cls.model.select()
+            stmt = cls._where_template(stmt, filter_keys)
+            if orderby is not None:
+                order_field = cls._columns[orderby]
+                stmt = stmt.order_by(order_field.desc() if sort == "desc" else order_field.asc())
+            if limit:
+                stmt = stmt.limit(bindparam("p_limit"))
+            return stmt
+
+        if projection is False:
+            return with_soft_delete(build())
+        return cls._cached_template(("query", filter_keys, projection, orderby, sort, limit), build)
+
+    @classmethod
+    def page_template(cls, filter_keys: tuple, *, dto_model_class: Type[BaseModel] = None, orderby: str,
+                      sort: str) -> tuple[Select, Select]:
+        """
+        分页语句模板: 返回 (分页查询, 总数查询), 分页查询以 p_limit / p_offset 占位
+        """
+        projection = cls._projection(dto_model_class)
+        query_stmt = cls.query_template(filter_keys, dto_model_class=dto_model_class, orderby=orderby, sort=sort)
+        page_stmt = cls._cached_template(
+            ("page", filter_keys, projection, orderby, sort),
+            lambda: query_stmt.limit(bindparam("p_limit")).offset(bindparam("p_offset")))
+        return page_stmt, cls.count_template(filter_keys)
+
+    @classmethod
+    def count_template(cls, filter_keys: tuple = ()) -> Select:
+        """
+        总数查询模板, 以执行选项 count_cache_key 标记形状, 总数缓存据此生成缓存键而不必每次编译
+        需由未附加逻辑删除条件的语句推导: with_only_columns 会把已附加的条件并入 where, 执行时再附加一次就重复了
+        """
+        return cls._cached_template(
+            ("count", filter_keys),
+            lambda: cls.build_count_stmt(cls._where_template(cls.model.select(), filter_keys)).execution_options(
+                count_cache_key=("count", filter_keys)))
+
+    @classmethod
+    def _where_template(cls, stmt: Select, filter_keys: tuple) -> Select:
+        for name in filter_keys:
+            stmt = stmt.where(cls._columns[name] == bindparam(f"f_{name}"))
+        return stmt
+
+    @classmethod
+    def list_stmt(cls, query_params: Union[dict, BaseQueryReq], *, dto_model_class: Type[BaseModel] = None,
+                  fields: List = None, ordered: bool = True) -> tuple[Select, dict]:
+        """
+        由查询参数得到 (语句模板, 绑定参数), 供列表类查询直接执行
+        """
+        filters, options = cls.split_query_params(query_params)
+        params = cls.bind_values(filters)
+        orderby = sort = None
+        if ordered:
+            orderby, sort = cls.order_options(options)
+        limit = options.get("limit")
+        if limit is not None:
+            params["p_limit"] = limit
+        stmt = cls.query_template(tuple(sorted(filters)), dto_model_class=dto_model_class, fields=fields,
+                                  orderby=orderby, sort=sort, limit=limit is not None)
+        return stmt, params
 
     @classmethod
     def get_query_stmt(cls, query_params, stmt=None, *, fields: list = None):
+        """
+        在 stmt 上追加过滤条件(直接绑定值), 用于自定义语句的拼接
+        常规查询使用 list_stmt 得到可复用的语句模板
+        """
         if stmt is None:
             if fields:
                 stmt = cls.model.select(fields)
             else:
                 stmt = cls.model.select()
-        for key, value in query_params.items():
-            if value is None:
-                continue
-            if isinstance(key, str) and hasattr(cls.model, key):  # 第一步：先确定 key 的类型
-                # 第二步：根据类型，用对应的方式处理
-                field = getattr(cls.model, key)
-            elif hasattr(key, 'model') and key.model is cls.model:
-                field = key
-            else:
-                continue
-            stmt = stmt.where(field == value)
+        filters, _ = cls.split_query_params(query_params)
+        index_advisor.observe(cls.model.__tablename__, tuple(sorted(filters)))
+        for key, value in filters.items():
+            stmt = stmt.where(cls._columns[key] == value)
         return stmt
 
     @classmethod
@@ -67,44 +305,274 @@ class BaseService(Generic[T]):
         pass
 
     @classmethod
-    async def get_by_page(cls, query_params: Union[dict, BasePageQueryReq], dto_model_class: Type[BaseModel] = None) -> \
-            BasePageResp[T]:
-        if not isinstance(query_params, dict):
-            query_params = query_params.model_dump()
-        query_params = {k: v for k, v in query_params.items() if v not in [None, ""]}
-        fields = None
-        if dto_model_class is not None:
-            fields = [getattr(cls.model, key) for key in dto_model_class.model_fields.keys()]
-        query_stmt = cls.get_query_stmt(query_params, fields=fields)
+    def permission_criteria(cls) -> list:
+        """
+        当前用户可修改 / 删除数据的 SQL 条件, 与 check_base_permission 对应
+        条件更新 / 删除时并入 WHERE, 无需先查出数据再检查, 默认无额外条件, 子类按需覆盖
+        """
+        return []
 
-        return await cls.auto_page(query_stmt, query_params, dto_model_class)
+    @classmethod
+    def on_data_changed(cls, ids: Optional[list] = None, *, session: Optional[AsyncSession] = None):
+        """
+        写操作后的回调, 用于使本模型相关的缓存失效
+        ids: 受影响的数据 id, 为 None 表示影响范围未知
+        session: 执行写操作的会话, 传入时在事务提交后再失效一次:
+        提交前的并发读取仍会读到旧数据, 并可能在本次失效之后回填缓存
+        """
+        cls._invalidate_caches(ids)
+        if session is not None:
+            call_after_commit(session, lambda: cls._invalidate_caches(ids))
+        loaders = current_loaders.get()
+        if loaders and cls.model in loaders:
+            loaders[cls.model].clear(ids)
+
+    @classmethod
+    def _invalidate_caches(cls, ids: Optional[list] = None):
+        count_cache.invalidate(cls.model.__tablename__)
+        negative_existence_cache.invalidate(cls.model.__tablename__)
+        if cls.entity_cache is not None:
+            if ids is None:
+                cls.entity_cache.clear()
+            else:
+                cls.entity_cache.invalidate(ids)
+
+    @classmethod
+    def remember_values(cls, rows: list):
+        """写入或更新后把布隆过滤器字段的新取值加入过滤器, rows 为字典或模型对象"""
+        if cls.bloom_filter is not None:
+            cls.bloom_filter.add_rows(rows)
+
+    @classmethod
+    async def get_by_page(cls, query_params: Union[dict, BasePageQueryReq], dto_model_class: Type[BaseModel] = None,
+                          count_mode: Optional[str] = None) -> BasePageResp[T]:
+        """
+        count_mode: 总数统计方式(exact/cached/estimate/none), 不传时取 query_params 中的 count_mode, 默认 exact
+        """
+        filters, options = cls.split_query_params(query_params)
+        filter_keys = tuple(sorted(filters))
+        params = cls.bind_values(filters)
+        with track_service_method(f"{cls.__name__}.get_by_page"):
+            if options.get("page_mode") == "cursor":
+                query_stmt = cls.query_template(filter_keys, dto_model_class=dto_model_class)
+                return await cls.cursor_page(query_stmt, options, dto_model_class, params=params)
+
+            page = cls.page_options(options, count_mode)
+            page_stmt, count_stmt = cls.page_template(filter_keys, dto_model_class=dto_model_class,
+                                                      orderby=page["orderby"], sort=page["sort"])
+            return await cls._fetch_page(page_stmt, count_stmt, params, page, dto_model_class)
+
+    @classmethod
+    def page_size_option(cls, query_params: dict) -> int:
+        """每页条数, 限制在 1 ~ MAX_PAGE_SIZE 之间(字典参数不经过 BasePageQueryReq 校验)"""
+        page_size = int(query_params.get("page_size") or Constant.DEFAULT_PAGE_SIZE)
+        return min(max(page_size, 1), Constant.MAX_PAGE_SIZE)
+
+    @classmethod
+    def page_options(cls, query_params: dict, count_mode: Optional[str] = None) -> dict:
+        """
+        解析分页参数: page_number、page_size、orderby、sort、count_mode
+        """
+        orderby, sort = cls.order_options(query_params)
+        count_mode = count_mode or query_params.get("count_mode") or CountMode.EXACT
+        if count_mode not in CountMode.__members__.values():
+            raise AppException(f"不支持的总数统计方式: {count_mode}", code=RetCode.ARGUMENT_ERROR)
+        page_number = max(int(query_params.get("page_number") or 1), 1)
+        return {"page_number": page_number, "page_size": cls.page_size_option(query_params),
+                "orderby": orderby, "sort": sort, "count_mode": count_mode}
 
     @classmethod
-    @with_db_session()
     async def auto_page(cls, query_stmt, query_params: Union[dict, BasePageQueryReq] = None,
-                        dto_model_class: Type[BaseModel] = None, *, session: Optional[AsyncSession]) -> BasePageResp[T]:
+                        dto_model_class: Type[BaseModel] = None, *, count_mode: Optional[str] = None,
+                        session: Optional[AsyncSession] = None) -> BasePageResp[T]:
+        """
+        对自定义的查询语句分页, query_params 中只读取分页相关参数
+        """
         if not query_params:
             query_params = {}
         if not isinstance(query_params, dict):
             query_params = query_params.model_dump()
-        page_number = query_params.get("page_number", 1)
-        page_size = query_params.get("page_size", 12)
-        sort = query_params.get("sort", "desc")
-        orderby = query_params.get("orderby", "created_time")
+        if query_params.get("page_mode") == "cursor":
+            return await cls.cursor_page(query_stmt, query_params, dto_model_class, session=session)
 
-        if sort == "desc":
-            query_stmt = query_stmt.order_by(getattr(cls.model, orderby).desc())
+        page = cls.page_options(query_params, count_mode)
+        count_stmt = cls.build_count_stmt(query_stmt)
+        order_field = cls._columns[page["orderby"]]
+        query_stmt = query_stmt.order_by(order_field.desc() if page["sort"] == "desc" else order_field.asc())
+        query_stmt = query_stmt.limit(bindparam("p_limit")).offset(bindparam("p_offset"))
+        with track_service_method(f"{cls.__name__}.auto_page"):
+            return await cls._fetch_page(query_stmt, count_stmt, {}, page, dto_model_class, session=session)
+
+    @classmethod
+    async def _fetch_page(cls, page_stmt, count_stmt, params: dict, page: dict,
+                          dto_model_class: Type[BaseModel] = None, *,
+                          session: Optional[AsyncSession] = None) -> BasePageResp[T]:
+        """
+        执行分页查询, page_stmt 以 p_limit / p_offset 占位
+        未传递 session 时, 总数查询与分页数据查询分别占用一个连接并发执行, 耗时接近二者中较慢的一个
+        传递了 session 或处于工作单元中时, 在该 session 上依次执行
+        """
+        if session is None:
+            # 工作单元中在请求级 session 上依次执行, 不另外占用连接
+            session = current_session.get()
+        page_number, page_size, count_mode = page["page_number"], page["page_size"], page["count_mode"]
+        # 不统计总数时多取一条, 用于判断是否有下一页
+        limit = page_size + 1 if count_mode == CountMode.NONE else page_size
+        page_params = {**params, "p_limit": limit, "p_offset": (page_number - 1) * page_size}
+
+        if session is not None:
+            total = await cls.page_total(count_stmt, count_mode, params=params, session=session)
+            exec_result = await session.execute(page_stmt, page_params)
+            result = cls.parse_result(exec_result, dto_model_class=dto_model_class)
+        else:
+            async def fetch_items():
+                async with get_db_session() as item_session:
+                    exec_result = await item_session.execute(page_stmt, page_params)
+                    return cls.parse_result(exec_result, dto_model_class=dto_model_class)
+
+            total, result = await asyncio.gather(cls.page_total(count_stmt, count_mode, params=params),
+                                                 fetch_items())
+
+        if count_mode == CountMode.NONE:
+            has_next = len(result) > page_size
+            result = result[:page_size]
+            page_count = None
+        else:
+            total = total or 0
+            page_count = math.ceil(total / page_size) if page_size else 0
+            has_next = page_number < page_count
+        return BasePageResp(
+            **{"page_number": page_number, "page_size": page_size, "page_count": page_count, "count": total,
+               "sort": page["sort"], "orderby": page["orderby"], "data": result, "has_next": has_next})
+
+    @classmethod
+    @with_db_session()
+    async def page_total(cls, count_stmt, count_mode: str = CountMode.EXACT, *, params: dict = None,
+                         session: Optional[AsyncSession] = None) -> Optional[int]:
+        """
+        按统计方式获取分页总数, none 模式不查询直接返回 None
+        params: 总数查询的绑定参数(语句模板)
+        """
+        if count_mode == CountMode.NONE:
+            return None
+        if count_mode == CountMode.ESTIMATE:
+            # 表统计信息只能估算整表行数, 带过滤条件时退回缓存计数
+            if count_stmt.whereclause is None:
+                estimated = await cls.estimate_table_rows(session=session)
+                if estimated is not None:
+                    return estimated
+            count_mode = CountMode.CACHED
+        if count_mode == CountMode.CACHED:
+            cache_key = count_cache.make_key(count_stmt, params)
+            total = count_cache.get(cls.model.__tablename__, cache_key)
+            if total is None:
+                # 回填缓存的读取走主库, 避免把副本上失效之前的旧总数缓存一个 ttl
+                total = await session.scalar(count_stmt, params, bind_arguments={"use_primary": True}) or 0
+                count_cache.set(cls.model.__tablename__, cache_key, total)
+            return total
+        return await session.scalar(count_stmt, params)
+
+    @classmethod
+    @with_db_session()
+    async def estimate_table_rows(cls, *, session: Optional[AsyncSession] = None) -> Optional[int]:
+        """
+        从数据库统计信息中读取表的估算行数(包含已逻辑删除的数据), 不支持的数据库返回 None
+        """
+        table_name = cls.model.__tablename__
+        dialect = session.get_bind().dialect.name
+        if dialect == "mysql":
+            stmt = text("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name")
+        elif dialect == "postgresql":
+            stmt = text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)")
         else:
-            query_stmt = query_stmt.order_by(getattr(cls.model, orderby).asc())
+            return None
+        estimated = await session.scalar(stmt, {"table_name": table_name})
+        if estimated is None or estimated < 0:
+            return None
+        return int(estimated)
+
+    @classmethod
+    def build_count_stmt(cls, query_stmt):
+        """
+        由查询语句直接推导总数查询: 复用其过滤条件, 去掉排序、分页和投影, 只统计 id
+        带有 group by / distinct 的语句无法直接改写, 退回子查询统计
+        """
+        query_stmt = query_stmt.order_by(None).limit(None).offset(None)
+        if query_stmt._group_by_clauses or query_stmt._distinct:
+            return select(func.count()).select_from(query_stmt.subquery())
+        return query_stmt.with_only_columns(func.count(cls.model.id), maintain_column_froms=True)
+
+    @classmethod
+    @with_db_session()
+    async def cursor_page(cls, query_stmt, query_params: dict, dto_model_class: Type[BaseModel] = None, *,
+                          params: dict = None, session: Optional[AsyncSession] = None) -> BasePageResp[T]:
+        """
+        游标(keyset)分页: 以 (排序字段, id) 作为定位条件, 不使用 OFFSET, 也不统计总数
+        无论翻到第几页, 都只是一次索引范围扫描 + LIMIT
+        params: query_stmt 的绑定参数(语句模板)
+        """
+        page_size = cls.page_size_option(query_params)
+        orderby, sort = cls.order_options(query_params)
+        order_field = cls._columns[orderby]
+        id_field = cls.model.id
+        cursor = query_params.get("cursor")
+
+        direction = "next"
+        if cursor:
+            (order_value, id_value), direction = decode_cursor(cursor, orderby, sort)
+            # 向后翻页沿排序方向继续, 向前翻页则反向查找
+            forward = (sort == "desc") == (direction == "next")
+            if forward:
+                seek = or_(order_field < order_value, and_(order_field == order_value, id_field < id_value))
+            else:
+                seek = or_(order_field > order_value, and_(order_field == order_value, id_field > id_value))
+            query_stmt = query_stmt.where(seek)
+
+        # 向前翻页时反向排序, 取出后再翻转回来
+        descending = (sort == "desc") == (direction == "next")
+        if descending:
+            query_stmt = query_stmt.order_by(order_field.desc(), id_field.desc())
+        else:
+            query_stmt = query_stmt.order_by(order_field.asc(), id_field.asc())
 
-        query_page_result = await paginate(session, query_stmt, Params(page=page_number, size=page_size))
-        result = query_page_result.items
         if dto_model_class is not None:
-            # 使用 row._mapping 将 Row 对象转换为可解包的字典
-            result = [dto_model_class(**dict(row._mapping)) for row in result]
+            # 投影查询时需要带上排序字段和 id 才能生成游标
+            selected = {col.key for col in query_stmt.selected_columns}
+            for field in (order_field, id_field):
+                if field.key not in selected:
+                    query_stmt = query_stmt.add_columns(field)
+
+        # 多取一条用于判断是否还有下一页
+        exec_result = await session.execute(query_stmt.limit(page_size + 1), params)
+        if dto_model_class is not None:
+            rows = [dict(row._mapping) for row in exec_result.all()]
+        else:
+            rows = list(exec_result.scalars().all())
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if direction == "prev":
+            rows.reverse()
+
+        def cursor_values(row):
+            if isinstance(row, dict):
+                return [row[orderby], row["id"]]
+            return [getattr(row, orderby), row.id]
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if direction == "next" and has_more or direction == "prev":
+                next_cursor = encode_cursor(orderby, sort, cursor_values(rows[-1]), "next")
+            if direction == "next" and cursor or direction == "prev" and has_more:
+                prev_cursor = encode_cursor(orderby, sort, cursor_values(rows[0]), "prev")
+
+        result = rows
+        if dto_model_class is not None:
+            result = [dto_model_class(**row) for row in rows]
         return BasePageResp(
-            **{"page_number": page_number, "page_size": page_size, "page_count": query_page_result.pages,
-                "count": query_page_result.total, "sort": sort, "orderby": orderby, "data": result, })
+            **{"page_number": None, "page_size": page_size, "page_count": None, "count": None, "sort": sort,
+               "orderby": orderby, "data": result, "has_next": next_cursor is not None, "next_cursor": next_cursor,
+               "prev_cursor": prev_cursor})
 
     @classmethod
     @with_db_session()
@@ -116,15 +584,92 @@ class BaseService(Generic[T]):
         session: 数据库会话---支持传递以便于事务管控
         获取数据集合
         """
-        query_stmt = cls.build_query(query_params, dto_model_class=dto_model_class)
-        exec_result = await session.execute(query_stmt)
+        query_stmt, params = cls.list_stmt(query_params, dto_model_class=dto_model_class)
+        exec_result = await session.execute(query_stmt, params)
         return cls.parse_result(exec_result, dto_model_class=dto_model_class)
 
+    @classmethod
+    async def stream_list(cls, query_params: Union[dict, BaseQueryReq], dto_model_class: Type[BaseModel] = None, *,
+                          batch_size: int = 1000) -> AsyncIterator[List[T] | List[BaseModel]]:
+        """
+        流式读取数据集合, 每次产出一批(最多 batch_size 条)
+        使用服务端游标按批拉取, 内存占用与总行数无关, 适用于导出等大结果集场景
+        使用独立的 session, 生命周期与迭代过程一致, 提前结束迭代(如客户端断开)时释放连接
+        """
+        query_stmt, params = cls.list_stmt(query_params, dto_model_class=dto_model_class)
+        query_stmt = query_stmt.execution_options(yield_per=batch_size)
+        async with get_db_session() as session:
+            if dto_model_class is not None:
+                stream_result = await session.stream(query_stmt, params)
+                async for rows in stream_result.partitions():
+                    yield [dto_model_class(**dict(row._mapping)) for row in rows]
+            else:
+                stream_result = await session.stream_scalars(query_stmt, params)
+                async for entities in stream_result.partitions():
+                    yield list(entities)
+
+    @classmethod
+    def changes_template(cls, has_cursor: bool, dto_model_class: Type[BaseModel] = None) -> Select:
+        """
+        变更查询模板: updated_time <= c_until 且 (updated_time, id) 大于游标, 按 (updated_time, id) 升序, 包含已逻辑删除的数据
+        以 c_until / c_time / c_id / p_limit 占位, 走 (updated_time, id) 索引的范围扫描
+        """
+        projection = cls._projection(dto_model_class)
+
+        def build():
+            if projection is None:
+                stmt = cls.model.select()
+            else:
+                # 增量同步需要 id、updated_time 生成游标, is_deleted 区分删除标记
+                names = dict.fromkeys((*projection, "id", "updated_time", Constant.LOGICAL_DELETE_FIELD))
+                stmt = select(*(cls._columns[name] for name in names if name in cls._columns))
+            time_field, id_field = cls._columns["updated_time"], cls.model.id
+            stmt = stmt.where(time_field <= bindparam("c_until"))
+            if has_cursor:
+                stmt = stmt.where(or_(time_field > bindparam("c_time"),
+                                      and_(time_field == bindparam("c_time"), id_field > bindparam("c_id"))))
+            return stmt.order_by(time_field.asc(), id_field.asc()).limit(bindparam("p_limit")) \
+                .execution_options(skip_soft_delete=True)
+
+        return cls._cached_template(("changes", has_cursor, projection), build)
+
+    @classmethod
+    @with_db_session()
+    async def get_changes(cls, cursor: Optional[str] = None, limit: int = 100,
+                          dto_model_class: Type[BaseModel] = None, *,
+                          session: Optional[AsyncSession] = None) -> BaseChangesResp:
+        """
+        增量同步: 返回游标之后新增、修改和删除的数据, 已逻辑删除的数据(is_deleted=1)作为删除标记返回
+        cursor: 上次返回的 next_cursor, 不传时从头开始; 没有新变更时 next_cursor 保持不变, 客户端可以继续轮询
+        只返回 updated_time 早于当前时间 change_feed_settle_ms 的数据: updated_time 在写入时生成,
+        晚提交的事务可能带着更早的时间, 留出的窗口避免游标越过尚未提交的数据
+        始终读主库: 副本的复制延迟不受该窗口约束, 游标一旦越过副本尚未收到的数据, 这些数据就不会再返回
+        """
+        params = {"c_until": current_timestamp() - settings.change_feed_settle_ms, "p_limit": limit + 1}
+        if cursor:
+            (params["c_time"], params["c_id"]), _ = decode_cursor(cursor, "updated_time", "asc")
+        stmt = cls.changes_template(bool(cursor), dto_model_class)
+        exec_result = await session.execute(stmt, params, bind_arguments={"use_primary": True})
+        if dto_model_class is not None:
+            rows = [dict(row._mapping) for row in exec_result.all()]
+        else:
+            rows = list(exec_result.scalars().all())
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = cursor
+        if rows:
+            last = rows[-1]
+            values = [last["updated_time"], last["id"]] if isinstance(last, dict) else [last.updated_time, last.id]
+            next_cursor = encode_cursor("updated_time", "asc", values)
+        if dto_model_class is not None:
+            rows = [dto_model_class(**row) for row in rows]
+        return BaseChangesResp(data=rows, next_cursor=next_cursor, has_more=has_more)
+
     @classmethod
     @with_db_session()
     async def get_id_list(cls, query_params: Union[dict, BaseQueryReq], *, session: Optional[AsyncSession] = None):
-        query_stmt = cls.build_query(query_params, fields=[cls.model.id])
-        exec_result = await session.scalars(query_stmt)
+        query_stmt, params = cls.list_stmt(query_params, fields=[cls.model.id])
+        exec_result = await session.scalars(query_stmt, params)
         return list(exec_result)
 
     @classmethod
@@ -133,64 +678,365 @@ class BaseService(Generic[T]):
         sample_obj = cls.model(**kwargs)
         session.add(sample_obj)
         await session.flush()
+        cls.remember_values([sample_obj])
+        cls.on_data_changed([sample_obj.id], session=session)
         return sample_obj
 
+    @classmethod
+    async def save_deferred(cls, data: Union[dict, SQLModel]) -> asyncio.Future:
+        """
+        通过写缓冲队列新增, 需在子类上设置 write_behind
+        返回 Future, 数据所在批次提交后以 id 完成, 写入失败时抛出对应异常; 不需要确认时可以不等待
+        不参与调用方的事务, 写入前的数据对查询不可见
+        """
+        if cls.write_behind is None:
+            raise AppException(f"{cls.__name__} 未启用写缓冲队列")
+        return await cls.write_behind.submit(data)
+
     @classmethod
     @with_db_session()
     async def save_entity(cls, db_model: SQLModel, *, session: Optional[AsyncSession] = None) -> T:
         session.add(db_model)
         await session.flush()
+        cls.remember_values([db_model])
+        cls.on_data_changed([db_model.id], session=session)
         return db_model
 
+    @classmethod
+    def prepare_insert_rows(cls, data_list: list) -> list[dict]:
+        """
+        批量写入前补全数据: 未传的字段按模型默认值填充(id、created_time、updated_time 等)
+        保证每行的字段集合一致, 以便作为 executemany 的参数, 不为每行构造模型对象
+        """
+        rows = [d if isinstance(d, dict) else d.model_dump(exclude_unset=True) for d in data_list]
+        columns = cls.model.__table__.columns.keys()
+        keys = {k for row in rows for k in row if k in columns}
+        keys.update(("id", "created_time", "updated_time"))
+        now = current_timestamp()
+        defaults, factories = {}, {}
+        for key in keys:
+            field = cls.model.model_fields.get(key)
+            if key in ("created_time", "updated_time"):
+                defaults[key] = now
+            elif field is not None and field.default_factory is not None:
+                factories[key] = field.default_factory
+            else:
+                defaults[key] = None if field is None or field.is_required() else field.get_default()
+
+        prepared = []
+        for row in rows:
+            item = {k: row[k] if row.get(k) is not None else defaults[k] for k in defaults}
+            for k, factory in factories.items():
+                value = row.get(k)
+                item[k] = factory() if value is None else value
+            prepared.append(item)
+        return prepared
+
+    @classmethod
+    @with_db_session()
+    async def insert_many(cls, data_list, batch_size=1000, *, max_packet_bytes: int = None, return_ids: bool = False,
+                          session: Optional[AsyncSession] = None) -> Union[int, List[str]]:
+        """
+        批量写入
+        data_list: 字典(或模型)列表
+        batch_size: 每批最大行数; max_packet_bytes: 每批估算的最大字节数, 默认取配置 db_max_packet_bytes
+        每批以一条 executemany 语句写入(驱动会改写为多 VALUES 的 INSERT)
+        return_ids: 为 True 时返回写入的 id 列表, 否则返回写入行数
+        """
+        if not data_list:
+            return [] if return_ids else 0
+        start = time.perf_counter()
+        rows = cls.prepare_insert_rows(data_list)
+        insert_stmt = insert(cls.model.__table__)
+        for chunk in chunk_rows(rows, batch_size, max_packet_bytes or settings.db_max_packet_bytes):
+            await session.execute(insert_stmt, chunk)
+
+        elapsed = time.perf_counter() - start
+        logging.info("insert_many %s: %d rows in %.3fs (%.0f rows/s)", cls.model.__tablename__, len(rows), elapsed,
+                     len(rows) / elapsed if elapsed else 0)
+        ids = [row["id"] for row in rows]
+        cls.remember_values(rows)
+        cls.on_data_changed(ids, session=session)
+        return ids if return_ids else len(rows)
+
     @classmethod
     @with_db_session()
-    async def insert_many(cls, data_list, batch_size=100, *, session: Optional[AsyncSession] = None) -> None:
-        async with session:
-            for d in data_list:
-                if not d.get("id", None):
-                    d["id"] = get_uuid()
+    async def upsert_many(cls, rows: list, conflict_keys: List[str], update_columns: List[str] = None,
+                          batch_size: int = 1000, *, max_packet_bytes: int = None,
+                          session: Optional[AsyncSession] = None) -> dict:
+        """
+        批量写入或更新(upsert), 返回 {"inserted": 新增行数, "updated": 更新行数}
+        conflict_keys: 判断冲突的字段, 必须是主键或唯一索引
+        update_columns: 冲突时更新的字段, 默认为除冲突字段、id、created_time 外传入的全部字段
+        MySQL 编译为 INSERT ... ON DUPLICATE KEY UPDATE, PostgreSQL / SQLite 编译为 INSERT ... ON CONFLICT DO UPDATE
+        冲突更新时会刷新 updated_time, 并恢复已逻辑删除的数据
+        """
+        if not rows:
+            return {"inserted": 0, "updated": 0}
+        rows = cls.prepare_insert_rows(rows)
+        if update_columns is None:
+            update_columns = [k for k in rows[0] if k not in conflict_keys and k not in ("id", "created_time")]
+        table = cls.model.__table__
+        dialect = session.get_bind().dialect.name
+
+        inserted = updated = 0
+        for chunk in chunk_rows(rows, batch_size, max_packet_bytes or settings.db_max_packet_bytes):
+            if dialect == "mysql":
+                upsert_stmt = mysql_insert(table).values(chunk)
+                excluded = upsert_stmt.inserted
+            elif dialect in ("postgresql", "sqlite"):
+                upsert_stmt = (pg_insert if dialect == "postgresql" else sqlite_insert)(table).values(chunk)
+                excluded = upsert_stmt.excluded
+            else:
+                raise AppException(f"upsert 不支持当前数据库: {dialect}")
+            set_ = {col: excluded[col] for col in update_columns}
+            set_["updated_time"] = excluded["updated_time"]
+            set_.setdefault(Constant.LOGICAL_DELETE_FIELD, IsDelete.NO_DELETE)
 
-            for i in range(0, len(data_list), batch_size):
-                session.add_all(data_list[i: i + batch_size])
+            if dialect == "mysql":
+                # 每行受影响数: 新增为 1, 更新为 2
+                result = await session.execute(upsert_stmt.on_duplicate_key_update(set_))
+                chunk_updated = max(result.rowcount - len(chunk), 0)
+            elif dialect == "postgresql":
+                # xmax 为 0 表示该行是新插入的
+                upsert_stmt = upsert_stmt.on_conflict_do_update(index_elements=conflict_keys, set_=set_).returning(
+                    literal_column("xmax = 0"))
+                result = await session.execute(upsert_stmt)
+                chunk_updated = sum(1 for is_insert in result.scalars() if not is_insert)
+            else:
+                # SQLite 无法从结果区分新增与更新, 先查出本批已存在的冲突键
+                chunk_updated = await cls._count_existing_keys(chunk, conflict_keys, session=session)
+                await session.execute(upsert_stmt.on_conflict_do_update(index_elements=conflict_keys, set_=set_))
+            updated += chunk_updated
+            inserted += len(chunk) - chunk_updated
+        cls.remember_values(rows)
+        cls.on_data_changed(session=session)
+        return {"inserted": inserted, "updated": updated}
+
+    @classmethod
+    async def _count_existing_keys(cls, rows: list[dict], keys: List[str], *, session: AsyncSession) -> int:
+        table = cls.model.__table__
+        key_columns = [table.c[k] for k in keys]
+        key_values = {tuple(row[k] for k in keys) for row in rows}
+        if len(key_columns) == 1:
+            condition = key_columns[0].in_([v[0] for v in key_values])
+        else:
+            condition = tuple_(*key_columns).in_(list(key_values))
+        stmt = select(func.count()).select_from(table).where(condition)
+        # 紧接着要在主库上写入, 计数必须读主库
+        return await session.scalar(stmt, execution_options={"skip_soft_delete": True},
+                                    bind_arguments={"use_primary": True})
 
     @classmethod
     @with_db_session()
     async def update_by_id(cls, pid, data, *, session: Optional[AsyncSession] = None) -> int:
         update_stmt = cls.model.update().where(cls.model.id == pid).values(**data)
         result = await session.execute(update_stmt)
+        cls.remember_values([data])
+        cls.on_data_changed([pid], session=session)
+        return result.rowcount
+
+    @classmethod
+    def _conditional_where(cls, stmt, pid):
+        """按 id 定位未逻辑删除且满足 permission_criteria 的数据"""
+        stmt = stmt.where(cls.model.id == pid)
+        if Constant.LOGICAL_DELETE_FIELD in cls._columns:
+            stmt = stmt.where(cls._columns[Constant.LOGICAL_DELETE_FIELD] == IsDelete.NO_DELETE)
+        for criteria in cls.permission_criteria():
+            stmt = stmt.where(criteria)
+        # 不同步会话中已加载的对象, 避免不支持 RETURNING 的数据库额外执行一次 SELECT
+        return stmt.execution_options(synchronize_session=False)
+
+    @classmethod
+    async def _execute_conditional(cls, stmt, returning: bool, *, session: AsyncSession) -> int:
+        """支持 RETURNING 时以返回的行数为准, 否则读取 rowcount"""
+        if returning:
+            result = await session.execute(stmt.returning(cls.model.id))
+            return len(result.all())
+        result = await session.execute(stmt)
         return result.rowcount
 
     @classmethod
     @with_db_session()
-    async def update_many_by_id(cls, data_list, *, session: Optional[AsyncSession] = None) -> None:
-        async with session:
-            for data in data_list:
-                stmt = cls.model.update().where(cls.model.id == data["id"]).values(**data)
-                await session.execute(stmt)
+    async def conditional_update_by_id(cls, pid, data, *, session: Optional[AsyncSession] = None) -> int:
+        """
+        条件更新: 存在性与权限检查合并进同一条 UPDATE 的 WHERE, 返回受影响行数
+        返回 0 表示数据不存在、已删除或无权限
+        """
+        update_stmt = cls._conditional_where(cls.model.update().values(**data), pid)
+        rowcount = await cls._execute_conditional(update_stmt, session.get_bind().dialect.update_returning,
+                                                  session=session)
+        if rowcount:
+            cls.remember_values([data])
+            cls.on_data_changed([pid], session=session)
+        return rowcount
+
+    @classmethod
+    @with_db_session()
+    async def conditional_delete_by_id(cls, pid, *, session: Optional[AsyncSession] = None) -> int:
+        """条件删除: 同 conditional_update_by_id, 有逻辑删除字段时由会话事件改写为 UPDATE"""
+        delete_stmt = cls._conditional_where(cls.model.delete(), pid)
+        dialect = session.get_bind().dialect
+        returning = dialect.update_returning if Constant.LOGICAL_DELETE_FIELD in cls._columns \
+            else dialect.delete_returning
+        rowcount = await cls._execute_conditional(delete_stmt, returning, session=session)
+        if rowcount:
+            cls.on_data_changed([pid], session=session)
+        return rowcount
+
+    @classmethod
+    async def _conditional_ids(cls, pids: list, *, session: AsyncSession) -> set:
+        """
+        pids 中存在、未逻辑删除且满足 permission_criteria 的 id, 在主库上加行锁(FOR UPDATE)读取,
+        保证同一事务内随后的批量更新 / 删除作用于同一批数据
+        """
+        stmt = select(cls.model.id).where(cls.model.id.in_(pids))
+        for criteria in cls.permission_criteria():
+            stmt = stmt.where(criteria)
+        result = await session.scalars(stmt.with_for_update())
+        return set(result.all())
+
+    @classmethod
+    @with_db_session()
+    async def batch_write(cls, creates: list = None, updates: list = None, deletes: list = None, *,
+                          session: Optional[AsyncSession] = None) -> dict:
+        """
+        批量新增 / 更新 / 删除, 在同一个事务中执行, 返回 {"created": [新增 id], "updated": {成功 id}, "deleted": {成功 id}}
+        creates: 字典列表, 一次 insert_many 写入
+        updates: 含 id 的字典列表, 只更新存在且有权限的数据, 按修改的字段分组以 CASE 语句批量更新
+        deletes: id 列表, 只删除存在且有权限的数据, 一条语句完成
+        不存在或无权限的 id 不报错, 由调用方据返回结果判断; 数据库错误使整个批次回滚
+        """
+        creates, updates, deletes = creates or [], updates or [], deletes or []
+        created = await cls.insert_many(creates, return_ids=True, session=session) if creates else []
+        allowed = await cls._conditional_ids(list({data["id"] for data in updates} | set(deletes)),
+                                             session=session) if updates or deletes else set()
+        updated_rows = [data for data in updates if data["id"] in allowed]
+        if updated_rows:
+            await cls.update_many_by_id(updated_rows, session=session)
+        deleted_ids = [pid for pid in dict.fromkeys(deletes) if pid in allowed]
+        if deleted_ids:
+            await cls.delete_by_ids(deleted_ids, session=session)
+        return {"created": created, "updated": {data["id"] for data in updated_rows}, "deleted": set(deleted_ids)}
 
     @classmethod
     @with_db_session()
+    async def update_many_by_id(cls, data_list, *, strategy: str = BulkUpdateStrategy.CASE, batch_size: int = 500,
+                                session: Optional[AsyncSession] = None) -> int:
+        """
+        按 id 批量更新, 返回受影响的总行数
+        按每行要修改的字段集合分组, 每组按 strategy 发送:
+        case: 每 batch_size 个 id 一条 UPDATE ... SET col = CASE id WHEN ... END WHERE id IN (...)
+        executemany: 每组一条参数化 UPDATE, 交给驱动 executemany
+        未显式修改 updated_time 时由列的 onupdate 自动刷新
+        """
+        table = cls.model.__table__
+        groups: dict[tuple, list[dict]] = {}
+        for data in data_list:
+            columns = tuple(sorted(k for k in data if k != "id" and k in table.columns))
+            if columns:
+                groups.setdefault(columns, []).append(data)
+
+        rowcount = 0
+        for columns, rows in groups.items():
+            if strategy == BulkUpdateStrategy.EXECUTEMANY:
+                update_stmt = update(table).where(table.c.id == bindparam("_id")).values(
+                    {col: bindparam(f"_v_{col}") for col in columns})
+                params = [{"_id": row["id"], **{f"_v_{col}": row[col] for col in columns}} for row in rows]
+                result = await session.execute(update_stmt, params)
+                rowcount += result.rowcount
+                continue
+            for i in range(0, len(rows), batch_size):
+                chunk = rows[i: i + batch_size]
+                result = await session.execute(case_update_stmt(table, chunk, columns))
+                rowcount += result.rowcount
+        cls.remember_values(data_list)
+        cls.on_data_changed([data["id"] for data in data_list], session=session)
+        return rowcount
+
+    @classmethod
     async def get_by_id(cls, pid, *, session: Optional[AsyncSession] = None) -> T:
-        stmt = cls.model.select().where(cls.model.id == pid)
-        return await session.scalar(stmt)
+        """
+        启用实体缓存且未传递 session 时优先读缓存, 未命中再查库(主库, 副本可能尚未同步刚提交的修改)并回填
+        在请求上下文中时通过请求级批量加载器查库
+        传递了 session(事务内) 时始终查库, 不读缓存, 也不经过批量加载器
+        """
+        if session is not None:
+            return await cls._select_by_id(pid, session=session)
+        if cls.entity_cache is not None:
+            data = cls.entity_cache.get(pid)
+            if data is not None:
+                return cls._entity_from_cache(data)
+        loader = get_request_loader(cls.model, cls._batch_load_by_ids)
+        if loader is not None:
+            # 请求内同一轮事件循环的 get_by_id 合并为一次 IN 查询
+            return await loader.load(pid)
+        if cls.entity_cache is None:
+            return await cls._select_by_id(pid)
+        epoch = cls.entity_cache.epoch
+        entity = await cls._select_by_id(pid, use_primary=True)
+        if entity is not None and current_session.get() is None:
+            cls.entity_cache.put(pid, entity.model_dump(), epoch)
+        return entity
+
+    @classmethod
+    async def _batch_load_by_ids(cls, pids: list) -> dict:
+        return {entity.id: entity for entity in await cls.get_by_ids(pids)}
 
     @classmethod
     @with_db_session()
-    async def get_one(cls, query_params: Union[dict, BaseQueryReq], *, session: Optional[AsyncSession] = None) -> T:
+    async def _select_by_id(cls, pid, *, use_primary: bool = False, session: Optional[AsyncSession] = None) -> T:
+        """use_primary: 结果要回填缓存时读主库"""
+        stmt = cls._cached_template(("by_id",), lambda: cls.model.select().where(cls.model.id == bindparam("p_id")))
+        return await session.scalar(stmt, {"p_id": pid}, bind_arguments={"use_primary": use_primary})
 
-        if not isinstance(query_params, dict):
-            query_params = query_params.model_dump()
-        query_params = {k: v for k, v in query_params.items() if v not in [None, ""]}
-        query_stmt = cls.get_query_stmt(query_params)
-        return await session.scalar(query_stmt)
+    @classmethod
+    def _entity_from_cache(cls, data: dict) -> T:
+        # 标记为已持久化的游离对象, 与查库得到的对象行为一致(再次 add 时为更新而不是插入)
+        entity = cls.model(**data)
+        make_transient_to_detached(entity)
+        return entity
 
     @classmethod
     @with_db_session()
+    async def get_one(cls, query_params: Union[dict, BaseQueryReq], *, session: Optional[AsyncSession] = None) -> T:
+
+        query_stmt, params = cls.list_stmt(query_params, ordered=False)
+        return await session.scalar(query_stmt, params)
+
+    @classmethod
     async def get_by_ids(cls, pids, dto_model_class: Type[BaseModel] = None, *,
                          session: Optional[AsyncSession] = None) -> List[T]:
-        stmt = cls.build_query({}, dto_model_class=dto_model_class)
-        stmt = stmt.where(cls.model.id.in_(pids))
-        exec_result = await session.execute(stmt)
+        """
+        启用实体缓存且未传递 session 时, 只查询缓存未命中的 id(主库), 结果按 pids 的顺序返回
+        """
+        if cls.entity_cache is None or session is not None:
+            return await cls._select_by_ids(pids, dto_model_class, session=session)
+        found, missing = cls.entity_cache.get_many(dict.fromkeys(pids))
+        if missing:
+            epoch = cls.entity_cache.epoch
+            # 工作单元中读到的可能是未提交的数据, 不回填缓存
+            fill_cache = current_session.get() is None
+            for entity in await cls._select_by_ids(missing, use_primary=True):
+                data = entity.model_dump()
+                if fill_cache:
+                    cls.entity_cache.put(entity.id, data, epoch)
+                found[entity.id] = data
+        datas = [found[pid] for pid in dict.fromkeys(pids) if pid in found]
+        if dto_model_class is not None:
+            return [dto_model_class(**data) for data in datas]
+        return [cls._entity_from_cache(data) for data in datas]
+
+    @classmethod
+    @with_db_session()
+    async def _select_by_ids(cls, pids, dto_model_class: Type[BaseModel] = None, *, use_primary: bool = False,
+                             session: Optional[AsyncSession] = None) -> List[T]:
+        projection = cls._projection(dto_model_class)
+        stmt = cls._cached_template(
+            ("by_ids", projection),
+            lambda: cls.query_template(dto_model_class=dto_model_class).where(
+                cls.model.id.in_(bindparam("p_ids", expanding=True))))
+        exec_result = await session.execute(stmt, {"p_ids": list(pids)}, bind_arguments={"use_primary": use_primary})
         return cls.parse_result(exec_result, dto_model_class=dto_model_class)
 
     @classmethod
@@ -201,6 +1047,7 @@ class BaseService(Generic[T]):
         for k, v in delete_params.items():
             del_stmt = del_stmt.where(getattr(cls.model, k) == v)
         exec_result = await session.execute(del_stmt)
+        cls.on_data_changed(session=session)
         return exec_result.rowcount
 
     @classmethod
@@ -209,6 +1056,7 @@ class BaseService(Generic[T]):
 
         del_stmt = cls.model.delete().where(cls.model.id == pid)
         exec_result = await session.execute(del_stmt)
+        cls.on_data_changed([pid], session=session)
         return exec_result.rowcount
 
     @classmethod
@@ -217,21 +1065,133 @@ class BaseService(Generic[T]):
 
         del_stmt = cls.model.delete().where(cls.model.id.in_(pids))
         result = await session.execute(del_stmt)
+        cls.on_data_changed(list(pids), session=session)
         return result.rowcount
 
+    @classmethod
+    async def purge_deleted(cls) -> int:
+        """
+        按 retention 归档 / 物理删除已逻辑删除且超过保留期的数据, 返回处理的行数
+        每批一个事务: 按 (updated_time, id) 取一批并加锁(SKIP LOCKED, 多个 worker 同时执行时互不等待),
+        需要归档时先写入归档表, 再以 skip_soft_delete 物理删除, 提交后按限速等待再处理下一批
+        """
+        policy = cls.retention
+        table = cls.model.__table__
+        deleted_field = cls._columns[Constant.LOGICAL_DELETE_FIELD]
+        time_field, id_field = cls._columns["updated_time"], cls.model.id
+        now = current_timestamp()
+        cutoff = policy.cutoff(now)
+        archive = archive_table_for(table) if policy.archive else None
+        if archive is not None:
+            async with get_db_session() as session:
+                await session.run_sync(lambda sync_session: archive.create(sync_session.connection(), checkfirst=True))
+
+        policy.running, policy.last_started, policy.last_error, policy.position = True, now, None, None
+        total, last = 0, None
+        try:
+            while True:
+                start = time.perf_counter()
+                stmt = select(*table.columns).where(deleted_field == IsDelete.DELETE, time_field < cutoff)
+                if last is not None:
+                    stmt = stmt.where(or_(time_field > last[0], and_(time_field == last[0], id_field > last[1])))
+                stmt = stmt.order_by(time_field.asc(), id_field.asc()).limit(policy.batch_size) \
+                    .with_for_update(skip_locked=True).execution_options(skip_soft_delete=True)
+                async with get_db_session() as session:
+                    rows = [dict(row._mapping) for row in (await session.execute(stmt)).all()]
+                    if not rows:
+                        break
+                    if archive is not None:
+                        await session.execute(insert(archive), [{**row, "archived_time": now} for row in rows])
+                    await session.execute(cls.model.delete().where(id_field.in_([row["id"] for row in rows]))
+                                          .execution_options(skip_soft_delete=True, synchronize_session=False))
+                if archive is not None:
+                    policy.archived += len(rows)
+                else:
+                    policy.deleted += len(rows)
+                total += len(rows)
+                last = (rows[-1]["updated_time"], rows[-1]["id"])
+                policy.position = last[0]
+                await policy.throttle(len(rows), time.perf_counter() - start)
+        finally:
+            policy.running, policy.runs, policy.last_run_rows = False, policy.runs + 1, total
+            policy.last_finished = current_timestamp()
+        if total:
+            logging.info("purge %s: %d rows %s", table.name, total, "archived" if archive is not None else "deleted")
+        return total
+
     @classmethod
     @with_db_session()
     async def get_data_count(cls, query_params: dict = None, *, session: Optional[AsyncSession] = None) -> int:
 
         if not query_params:
             raise Exception("参数为空")
-        stmt = cls.get_query_stmt(query_params, fields=[func.count(cls.model.id)])
-        # stmt = cls.get_query_stmt(query_params)
-        return await session.scalar(stmt)
+        filters, _ = cls.split_query_params(query_params)
+        filter_keys = tuple(sorted(filters))
+        index_advisor.observe(cls.model.__tablename__, filter_keys)
+        return await session.scalar(cls.count_template(filter_keys), cls.bind_values(filters))
+
+    @classmethod
+    def exists_template(cls, filter_keys: tuple = ()) -> Select:
+        """存在性查询模板: SELECT 1 ... LIMIT 1, 命中第一行即返回, 不统计全部匹配行"""
+        return cls._cached_template(
+            ("exists", filter_keys),
+            lambda: with_soft_delete(cls._where_template(select(literal_column("1")).select_from(cls.model),
+                                                         filter_keys).limit(1)))
+
+    @classmethod
+    async def is_exist(cls, query_params: dict = None) -> bool:
+        """
+        判断是否存在满足条件的数据, 依次:
+        1. 启用布隆过滤器时, 任一过滤字段的取值一定不存在则直接返回 False
+        2. 短时间内查询过且结果为不存在的条件直接返回 False(写操作后失效)
+        3. 执行 SELECT 1 ... LIMIT 1, 启用否定结果缓存时读主库: 副本上尚未同步的新数据会被判为不存在并缓存
+        """
+        if not query_params:
+            raise Exception("参数为空")
+        filters, _ = cls.split_query_params(query_params)
+        if cls.bloom_filter is not None and cls.bloom_filter.definitely_absent(filters):
+            return False
+        model_name = cls.model.__tablename__
+        key = negative_existence_cache.make_key(filters)
+        if negative_existence_cache.contains(model_name, key):
+            return False
+        epoch = negative_existence_cache.epoch(model_name)
+        exists = await cls._query_exists(filters, use_primary=negative_existence_cache.ttl > 0)
+        if not exists:
+            negative_existence_cache.add(model_name, key, epoch)
+        return exists
 
     @classmethod
-    async def is_exist(cls, query_params: dict = None):
-        return await cls.get_data_count(query_params) > 0
+    @with_db_session()
+    async def _query_exists(cls, filters: dict, *, use_primary: bool = False,
+                            session: Optional[AsyncSession] = None) -> bool:
+        filter_keys = tuple(sorted(filters))
+        index_advisor.observe(cls.model.__tablename__, filter_keys)
+        return await session.scalar(cls.exists_template(filter_keys), cls.bind_values(filters),
+                                    bind_arguments={"use_primary": use_primary}) is not None
+
+    @classmethod
+    async def warm_bloom_filter(cls, batch_size: int = 10000):
+        """
+        重建布隆过滤器: 从主库流式读取过滤字段的全部取值(含已逻辑删除的数据, 以免恢复后被误判为不存在)
+        重建期间旧过滤器继续使用, 写入同时追加到新旧两份, 加载完成后替换
+        """
+        bloom_filter = cls.bloom_filter
+        bloom_filter.begin_rebuild()
+        stmt = select(*(cls._columns[name] for name in bloom_filter.columns)).execution_options(
+            skip_soft_delete=True, yield_per=batch_size)
+        start = time.perf_counter()
+        try:
+            async with get_db_session() as session:
+                stream_result = await session.stream(stmt, bind_arguments={"use_primary": True})
+                async for rows in stream_result.partitions():
+                    bloom_filter.add_loaded([row._mapping for row in rows])
+        except BaseException:
+            bloom_filter.abort_rebuild()
+            raise
+        bloom_filter.finish_rebuild()
+        logging.info("bloom filter %s%s warmed in %.3fs", cls.model.__tablename__, bloom_filter.columns,
+                     time.perf_counter() - start)
 
     @classmethod
     def build_query(cls, query_params: Union[dict, BaseQueryReq], *, dto_model_class: Type[BaseModel] = None,
@@ -240,37 +1200,23 @@ class BaseService(Generic[T]):
         可选dto_model_class、fields
         优先级dto_model_class>fields
         如果传递了dto_model_class则无需传递fields，fields会被dto_model_class覆盖
+        返回直接绑定值的新语句, 用于继续拼接; 直接执行时使用 list_stmt 得到可复用的语句模板
         """
-        if not isinstance(query_params, dict):
-            query_params = query_params.model_dump()
-        query_params = {k: v for k, v in query_params.items() if v not in [None, ""]}
-        sort = query_params.get("sort", "desc").lower()
-        orderby = query_params.get("orderby", "created_time").lower()
+        filters, options = cls.split_query_params(query_params)
+        orderby, sort = cls.order_options(options)
         if dto_model_class is not None:
-            # 安全映射：只获取 DTO 中存在且 Model 中也有的字段
-            # 避免 DTO 包含计算字段时 getattr 报错
-            db_columns = []
-            for key in dto_model_class.model_fields.keys():
-                if hasattr(cls.model, key):
-                    db_columns.append(getattr(cls.model, key))
-            fields = db_columns
-
-        query_stmt = cls.get_query_stmt(query_params, fields=fields)
-
-        if hasattr(cls.model, orderby):
-            order_field = getattr(cls.model, orderby)
-        else:
-            # 如果传入的 orderby 字段不存在，回退到默认排序，防止报错
-            order_field = cls.model.created_time
+            fields = [cls._columns[name] for name in cls._projection(dto_model_class)]
+        query_stmt = cls.get_query_stmt(filters, fields=fields)
 
         # 根据xxx字段排序
+        order_field = cls._columns[orderby]
         if sort == "desc":
             query_stmt = query_stmt.order_by(order_field.desc())
         else:
             query_stmt = query_stmt.order_by(order_field.asc())
 
-        if query_params.get("limit", None) is not None:
-            query_stmt = query_stmt.limit(query_params.get("limit"))
+        if options.get("limit") is not None:
+            query_stmt = query_stmt.limit(options["limit"])
         return query_stmt
 
     @classmethod
@@ -1,3 +1,5 @@
+from core.entity_cache import EntityCache
+from core.purge import RetentionPolicy
 from entity.db_models import User
 from service.base_service import BaseService
 
@@ -5,3 +7,5 @@ from service.base_service import BaseService
 # 5. 具体服务类
 class UserService(BaseService[User]):
     model = User  # 指定模型
+    entity_cache = EntityCache(ttl=60, max_bytes=16 * 1024 * 1024)  # 用户按 id 查询较频繁, 启用实体缓存
+    retention = RetentionPolicy(days=90, archive=True)  # 删除 90 天后移入 user_archive
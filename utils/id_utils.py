@@ -0,0 +1,92 @@
+import os
+import secrets
+import threading
+import time
+import uuid
+
+
+class Uuid7Generator:
+    """
+    UUIDv7(RFC 9562): 48 位毫秒时间戳 + 12 位计数器 + 62 位随机数
+    同一毫秒内计数器递增, 保证单进程内严格递增; 按字节序排序即按生成时间排序, 插入聚簇索引时只追加到末尾
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+
+    def __call__(self) -> uuid.UUID:
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms > self._last_ms:
+                # 计数器从随机值开始, 高位留出余量
+                self._last_ms, self._counter = ms, secrets.randbits(11)
+            else:
+                self._counter += 1
+                if self._counter > 0xFFF:
+                    # 同一毫秒内计数器用尽, 借用下一毫秒
+                    self._last_ms, self._counter = self._last_ms + 1, 0
+            ms, counter = self._last_ms, self._counter
+        value = (ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | secrets.randbits(62)
+        return uuid.UUID(int=value)
+
+
+class SnowflakeGenerator:
+    """
+    雪花算法 64 位 id: 41 位毫秒时间戳(自 2024-01-01 起, 约 69 年) + 10 位机器号 + 12 位序列号
+    每个进程(机器号)每毫秒最多生成 4096 个, 超出时休眠到下一毫秒; 时钟回拨时沿用上次的时间戳,
+    回拨期间序列号用尽且需要等待超过 MAX_WAIT_MS 时抛出异常, 不长时间阻塞调用方(事件循环)
+    """
+    EPOCH_MS = 1704067200000
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_WAIT_MS = 5
+
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id < (1 << self.WORKER_BITS):
+            raise ValueError(f"雪花算法机器号超出范围: {worker_id}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def __call__(self) -> int:
+        with self._lock:
+            ms = max(time.time_ns() // 1_000_000, self._last_ms)
+            if ms == self._last_ms and self._sequence < (1 << self.SEQUENCE_BITS) - 1:
+                self._sequence += 1
+            else:
+                if ms == self._last_ms:
+                    # 序列号用尽; 等待失败时保持用尽状态, 不会复用已发出的序列号
+                    ms = self._wait_next_ms()
+                self._sequence = 0
+            self._last_ms = ms
+            return ((ms - self.EPOCH_MS) << (self.WORKER_BITS + self.SEQUENCE_BITS)) \
+                | (self.worker_id << self.SEQUENCE_BITS) | self._sequence
+
+    def _wait_next_ms(self) -> int:
+        """序列号用尽: 休眠到上次时间戳的下一毫秒, 返回新的时间戳"""
+        while True:
+            wait_ms = self._last_ms + 1 - time.time_ns() / 1_000_000
+            if wait_ms <= 0:
+                return time.time_ns() // 1_000_000
+            if wait_ms > self.MAX_WAIT_MS:
+                raise RuntimeError(f"时钟回拨 {wait_ms:.0f} 毫秒, 雪花算法序列号已用尽, 暂时无法生成 id")
+            time.sleep(wait_ms / 1000)
+
+
+def process_worker_id() -> int:
+    """未配置机器号时按进程号取低 10 位; 多台机器部署时需显式配置, 否则可能冲突"""
+    return os.getpid() & ((1 << SnowflakeGenerator.WORKER_BITS) - 1)
+
+
+uuid7 = Uuid7Generator()
+
+
+def uuid1_hex() -> str:
+    return uuid.uuid1().hex
+
+
+def uuid7_hex() -> str:
+    return uuid7().hex